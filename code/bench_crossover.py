@@ -0,0 +1,103 @@
+import sys
+import time
+import random
+from genetic import GeneticAlgorithm, Chromosome
+
+
+def legacy_fill_missing_crossover(parent1, parent2, cut_i, cut_j):
+    """
+    The previous order crossover, which rebuilds the set of placed genes for every gene of parent2 and fills
+    the child with `list.pop(0)`. Kept as the baseline of the benchmark.
+
+    Args:
+        parent1 (list): The permutation whose segment is kept.
+        parent2 (list): The permutation giving the order of the remaining genes.
+        cut_i (int): The segment starts after this position.
+        cut_j (int): The segment ends at this position.
+
+    Returns:
+        list: The child permutation.
+    """
+    n = len(parent1)
+    child = [parent1[x] if cut_i < x <= cut_j else 0 for x in range(n)]
+    missing = [g for g in parent2 if g not in set(child) - {0}]
+    fill_positions = list(range(cut_j + 1, n)) + list(range(cut_i + 1))
+    for pos in fill_positions:
+        if child[pos] == 0:
+            child[pos] = missing.pop(0)
+    return child
+
+def random_chromosome(n_boxes, n_containers):
+    """
+    Creates a chromosome with random box packing and container loading sequences.
+
+    Args:
+        n_boxes (int): Length of the box packing sequence.
+        n_containers (int): Length of the container loading sequence.
+
+    Returns:
+        Chromosome: The random chromosome.
+    """
+    return Chromosome(random.sample(range(1, n_boxes + 1), n_boxes), random.sample(range(1, n_containers + 1), n_containers))
+
+def crossovers_per_second(crossover, pairs, min_time=0.2):
+    """
+    Measures the throughput of a crossover operator over a list of parent pairs.
+
+    Args:
+        crossover (callable): Function taking two parents and returning a child.
+        pairs (list): The parent pairs.
+        min_time (float, optional): Minimum measuring time in seconds. Default is 0.2.
+
+    Returns:
+        float: Number of crossovers per second.
+    """
+    count, start = 0, time.perf_counter()
+    while True:
+        for parent1, parent2 in pairs:
+            crossover(parent1, parent2)
+        count += len(pairs)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+def benchmark(lengths, n_containers=6, n_pairs=50, seed=0):
+    """
+    Measures the crossover throughput of the GA, and of the legacy operator, for several sequence lengths.
+
+    Args:
+        lengths (list): The box packing sequence lengths to measure.
+        n_containers (int, optional): Length of the container loading sequences. Default is 6.
+        n_pairs (int, optional): Number of parent pairs per length. Default is 50.
+        seed (int, optional): Seed of the random parents. Default is 0.
+
+    Returns:
+        list: For every length, the length, the GA and legacy crossovers per second, and the GA mating
+            throughput in chromosomes per second.
+    """
+    random.seed(seed)
+    ga = GeneticAlgorithm(uld_dimensions=[], package_dimensions=[])
+    results = []
+    for n_boxes in lengths:
+        pairs = [(random_chromosome(n_boxes, n_containers), random_chromosome(n_boxes, n_containers)) for _ in range(n_pairs)]
+
+        def legacy_crossover(parent1, parent2):
+            cut_i, cut_j = sorted(random.sample(range(n_boxes), 2))
+            return legacy_fill_missing_crossover(parent1.bps(), parent2.bps(), cut_i, cut_j)
+
+        ga_rate = crossovers_per_second(ga.crossover, pairs)
+        legacy_rate = crossovers_per_second(legacy_crossover, pairs)
+
+        mating_pool = [chromosome for pair in pairs for chromosome in pair]
+        start = time.perf_counter()
+        ga.perform_crossover(mating_pool, probability=1.0)
+        mating_rate = len(mating_pool) / (time.perf_counter() - start)
+        results.append((n_boxes, ga_rate, legacy_rate, mating_rate))
+    return results
+
+
+if __name__ == "__main__":
+    lengths = [int(n) for n in sys.argv[1:]] or [50, 100, 250, 500, 1000, 2000]
+    print(f"{'length':>8} {'crossover/s':>14} {'legacy/s':>12} {'speedup':>8} {'mating chrom/s':>16}")
+    for n_boxes, ga_rate, legacy_rate, mating_rate in benchmark(lengths):
+        print(f"{n_boxes:>8} {ga_rate:>14.0f} {legacy_rate:>12.0f} {ga_rate / legacy_rate:>8.1f} {mating_rate:>16.0f}")
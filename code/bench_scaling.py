@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import numpy as np
+from io_utils import parse_input
+from ocm import OptimalCargoManagement
+from validator import SolutionValidator, IncrementalValidator
+from manifest_generator import write_manifest
+
+DEFAULT_SIZES = [400, 2000, 5000, 10000, 20000]
+# Population of the GA under a phase budget, and number of greedy searches, as in `main.py`
+GA_BUDGET_POPULATION_SIZE = 16
+GREEDY_ITERATIONS = 2
+
+
+def timed(function, *args, **kwargs):
+    """
+    Calls a function and measures its wall-clock time.
+
+    Returns:
+        tuple: The result of the call and the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_phase(ocm, phase_budget, function, *args, **kwargs):
+    """
+    Runs a phase of the solver under an optional time budget, through the deadline of OptimalCargoManagement.
+
+    Args:
+        ocm (OptimalCargoManagement): The solver.
+        phase_budget (float): Time budget of the phase in seconds, or None.
+        function (callable): The phase.
+
+    Returns:
+        dict: The elapsed time and whether the phase was stopped by its budget.
+    """
+    ocm.deadline = None if phase_budget is None else time.monotonic() + phase_budget
+    _, seconds = timed(function, *args, **kwargs)
+    truncated = ocm.deadline_reached()
+    ocm.deadline = None
+    return {"seconds": seconds, "truncated": truncated}
+
+def greedy_pass(ocm, top_k, priority_ordering, economy_ordering, engine):
+    """
+    A greedy pass of `main.py`: priority packages in the top_k largest ULDs, then economy packages in the
+    unused ones.
+    """
+    largest_ulds_by_volume = sorted(
+        ocm.ulds.keys(),
+        key=lambda x: ((ocm.ulds[x].length * ocm.ulds[x].width * ocm.ulds[x].height), x),
+        reverse=True
+    )[:top_k]
+    ocm.fit_greedy(optional_ordering=priority_ordering, selected_ulds=largest_ulds_by_volume, engine=engine)
+    ocm.fit_greedy(optional_ordering=economy_ordering, selected_ulds=ocm.unused_uld_ids(), engine=engine)
+
+def greedy_search(ocm, validator, phase_budget, ordered_state, priority_ordering, economy_ordering, engine):
+    """
+    The greedy search of `main.py`: from the reoriented packages, every top_k is tried in turn, each greedy
+    pass being followed by the ad-hoc additions, until the solution is valid. If no top_k gives a valid
+    solution, the search is repeated with new package orderings, up to GREEDY_ITERATIONS times.
+
+    Args:
+        ocm (OptimalCargoManagement): The solver, with the packages ordered.
+        validator (IncrementalValidator): Validator following the solver.
+        phase_budget (float): Time budget in seconds of every greedy pass and of every ad-hoc additions, or None.
+        ordered_state (dict): Snapshot of the solver with the packages ordered.
+        priority_ordering (list): Ordering of the priority packages for the first search.
+        economy_ordering (list): Ordering of the economy packages for the first search.
+        engine (str): Engine of `fit_greedy`.
+
+    Returns:
+        tuple: The time spent in the greedy passes (including the new orderings and the reorientations) and in
+            the ad-hoc additions, with whether any of them was stopped by its budget, and the number of greedy
+            passes made.
+    """
+    phases = {
+        "fit_greedy": {"seconds": 0.0, "truncated": False},
+        "adhoc_additions": {"seconds": 0.0, "truncated": False},
+    }
+    attempts = 0
+    for iteration in range(GREEDY_ITERATIONS):
+        ocm.restore(ordered_state)
+        if iteration > 0:
+            (priority_ordering, economy_ordering), ordering_seconds = timed(ocm.create_package_ordering)
+            phases["fit_greedy"]["seconds"] += ordering_seconds
+        _, reorient_seconds = timed(ocm.reorient_packages)
+        phases["fit_greedy"]["seconds"] += reorient_seconds
+        reoriented_state = ocm.snapshot()
+
+        for top_k in range(min(ocm.MIN_PRIORITY_ULDS, len(ocm.ulds)//2) + 1, len(ocm.ulds)+1):
+            ocm.restore(reoriented_state)
+            attempts += 1
+            for phase, timing in (
+                ("fit_greedy", run_phase(ocm, phase_budget, greedy_pass, ocm, top_k, priority_ordering, economy_ordering, engine)),
+                ("adhoc_additions", run_phase(ocm, phase_budget, ocm.adhoc_additions)),
+            ):
+                phases[phase]["seconds"] += timing["seconds"]
+                phases[phase]["truncated"] |= timing["truncated"]
+            if validator.is_valid():
+                return phases, attempts
+    return phases, attempts
+
+def benchmark_size(n_packages, seed=0, phase_budget=None, run_ga=True, engine="rows", manifest_dir=None):
+    """
+    Generates a manifest and times every phase of the solver on it. The GA runs from the ordered packages,
+    and the greedy search with its ad-hoc additions from the same state restored, as in `main.py`.
+
+    Args:
+        n_packages (int): Number of packages of the manifest.
+        seed (int, optional): Seed of the manifest and of the solver. Default is 0.
+        phase_budget (float, optional): Time budget in seconds of the GA, and of every greedy pass and ad-hoc
+            additions. Default is None (no budget).
+        run_ga (bool, optional): Whether to time the genetic algorithm. Default is True.
+        engine (str, optional): Engine of `fit_greedy`. Default is "rows".
+        manifest_dir (str, optional): Directory of the generated manifests. Default is a temporary directory.
+
+    Returns:
+        dict: The size of the manifest, the time of every phase, the number of greedy passes of the greedy search
+            and the cost of the solution.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        manifest_file = os.path.join(manifest_dir or temporary_dir, f"manifest_{n_packages}_{seed}.txt")
+        write_manifest(manifest_file, n_packages, seed=seed)
+        (ulds, packages, K), parse_seconds = timed(parse_input, manifest_file)
+
+    phases = {"parse_input": {"seconds": parse_seconds, "truncated": False}}
+    ocm = OptimalCargoManagement(ulds, packages, K)
+    incremental_validator = IncrementalValidator(ocm)
+    (priority_ordering, economy_ordering), ordering_seconds = timed(ocm.create_package_ordering)
+    phases["create_package_ordering"] = {"seconds": ordering_seconds, "truncated": False}
+    ordered_state = ocm.snapshot()
+
+    if run_ga:
+        if phase_budget is None:
+            phases["run_genetic_algorithm"] = run_phase(ocm, phase_budget, ocm.run_genetic_algorithm)
+        else:
+            phases["run_genetic_algorithm"] = run_phase(ocm, phase_budget, ocm.run_genetic_algorithm, n_iter=None,
+                                                        population_size=GA_BUDGET_POPULATION_SIZE)
+        ocm.restore(ordered_state)
+
+    greedy_phases, greedy_attempts = greedy_search(ocm, incremental_validator, phase_budget, ordered_state,
+                                                   priority_ordering, economy_ordering, engine)
+    phases.update(greedy_phases)
+
+    # Every constraint is checked, so that the timing does not depend on where the first violation is
+    validator = SolutionValidator(ocm)
+    _, validate_seconds = timed(validator.validate, report_all=True)
+    phases["validate"] = {"seconds": validate_seconds, "truncated": False}
+
+    return {
+        "n_packages": n_packages,
+        "n_ulds": len(ulds),
+        "seed": seed,
+        "engine": engine,
+        "phases": phases,
+        "greedy_attempts": greedy_attempts,
+        "cost": ocm.cost(),
+        "packages_loaded": ocm.num_packages_loaded(),
+        "valid": validator.is_valid(),
+        "violations": len(validator.violations),
+    }
+
+def benchmark(sizes, seed=0, phase_budget=None, run_ga=True, engine="rows", verbose=False):
+    """
+    Runs `benchmark_size` for every size.
+
+    Args:
+        sizes (list): The numbers of packages.
+        seed (int, optional): Seed of the manifests and of the solver. Default is 0.
+        phase_budget (float, optional): Time budget in seconds of the GA, and of every greedy pass and ad-hoc
+            additions. Default is None.
+        run_ga (bool, optional): Whether to time the genetic algorithm. Default is True.
+        engine (str, optional): Engine of `fit_greedy`. Default is "rows".
+        verbose (bool, optional): Prints the timings of each size to stderr as they are measured. Default is False.
+
+    Returns:
+        dict: The environment of the run and the results of every size.
+    """
+    results = []
+    for n_packages in sizes:
+        result = benchmark_size(n_packages, seed=seed, phase_budget=phase_budget, run_ga=run_ga, engine=engine)
+        results.append(result)
+        if verbose:
+            timings = ", ".join(f"{phase} {timing['seconds']:.3f}s" for phase, timing in result["phases"].items())
+            print(f"{n_packages} packages: {timings}", file=sys.stderr)
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {"seed": seed, "phase_budget": phase_budget, "run_ga": run_ga, "engine": engine},
+        "results": results,
+    }
+
+def compare_results(baseline, current, tolerance=0.2, min_seconds=0.05):
+    """
+    Compares two benchmark runs and lists the phases that got slower.
+
+    Args:
+        baseline (dict): The reference run, as returned by `benchmark`.
+        current (dict): The new run.
+        tolerance (float, optional): Relative slowdown above which a phase is reported. Default is 0.2.
+        min_seconds (float, optional): Phases faster than this in both runs are ignored, being mostly noise.
+            Default is 0.05.
+
+    Returns:
+        list[str]: A message for every regression.
+    """
+    baseline_results = {result["n_packages"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        baseline_result = baseline_results.get(result["n_packages"])
+        if baseline_result is None:
+            continue
+        for phase, timing in result["phases"].items():
+            baseline_timing = baseline_result["phases"].get(phase)
+            if baseline_timing is None or max(timing["seconds"], baseline_timing["seconds"]) < min_seconds:
+                continue
+            if timing["seconds"] > baseline_timing["seconds"] * (1 + tolerance):
+                regressions.append(f"{result['n_packages']} packages, {phase}: "
+                                   f"{baseline_timing['seconds']:.3f}s -> {timing['seconds']:.3f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the phases of the solver on generated manifests")
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES, help="numbers of packages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--phase-budget", type=float, default=None,
+                        help="time budget in seconds of the GA, and of every greedy pass and ad-hoc additions")
+    parser.add_argument("--no-ga", action="store_true", help="skip the genetic algorithm")
+    parser.add_argument("--greedy-engine", choices=sorted(OptimalCargoManagement.GREEDY_ENGINES), default="rows")
+    parser.add_argument("--output", help="JSON file for the results, default is stdout")
+    parser.add_argument("--compare", help="JSON file of a previous run; exits with 1 if a phase got slower")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown reported by --compare")
+    args = parser.parse_args()
+
+    results = benchmark(args.sizes, seed=args.seed, phase_budget=args.phase_budget, run_ga=not args.no_ga,
+                        engine=args.greedy_engine, verbose=True)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare_results(json.load(file), results, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
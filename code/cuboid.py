@@ -1,5 +1,29 @@
 import numpy as np
 import random
+from profiling import PROFILER
+
+# Below this many cuboids a linear scan is cheaper than querying the spatial index
+GRID_MIN_CUBOIDS = 128
+
+# Candidate origins generated around each reference point by find_placement_batch, as the axes along which
+# the new cuboid size is subtracted from the point (in the order the candidates are shuffled)
+CANDIDATE_OFFSETS = np.array([
+    (0, 0, 0), (1, 1, 1), (0, 0, 1), (1, 1, 0),
+    (0, 1, 0), (1, 0, 0), (0, 0, 1), (1, 0, 1),
+], dtype=np.int64)
+
+# Corners of a cuboid in Cuboid.cuboid_corners order, as the axes taken from the maximum corner
+CORNER_SELECTORS = np.array([
+    (0, 0, 0), (0, 0, 1), (0, 1, 0), (0, 1, 1),
+    (1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1),
+], dtype=bool)
+
+# The octants around a point that a candidate of find_placement_batch can extend into, as the axes along which
+# they lie on the positive side of the point
+CANDIDATE_OCTANTS = np.unique(1 - CANDIDATE_OFFSETS, axis=0).astype(bool)
+
+# Upper bound on the number of candidate/cuboid pairs compared at once by find_placement_batch
+BATCH_PAIRS_PER_CHUNK = 1 << 21
 
 class Cuboid:
     """
@@ -94,49 +118,398 @@ class Cuboid:
             self.max_corner
         ]
 
-def find_placement(new_cuboid_size, larger_cuboid, existing_cuboids):
+class CuboidGrid:
+    """
+    Uniform grid spatial index over a container. Every cuboid is registered in the cells it overlaps,
+    so overlap tests only need to consider the cuboids sharing a cell with the queried cuboid.
+
+    Attributes:
+        container (Cuboid): The cuboid covered by the grid.
+        cell_size (tuple): Size of a cell along each axis.
+        cells_per_axis (tuple): Number of cells along each axis.
+        cells (dict): Lists of cuboids, keyed by cell coordinates (i, j, k).
+        cell_indices (dict): Lists of the insertion indices of the cuboids, keyed by cell coordinates (i, j, k).
+        cuboids (list): All the cuboids in the index, in insertion order.
+
+    Methods:
+        insert(cuboid): Adds a cuboid to the index.
+        query(cuboid): Returns the cuboids sharing at least one cell with a cuboid.
+        nearby_indices(cuboid): Returns the insertion indices of the cuboids sharing at least one cell with a cuboid.
+        bounds(): Returns the minimum and maximum corners of all the cuboids as arrays.
+    """
+
+    def __init__(self, container, cells_per_axis=4):
+        """
+        Initializes an empty CuboidGrid over a container.
+
+        Args:
+            container (Cuboid): The cuboid covered by the grid.
+            cells_per_axis (int, optional): Number of cells along each axis. Defaults to 4.
+        """
+        self.container = container
+        self.cell_size = tuple(
+            max(-(-(container.max_corner[i] - container.min_corner[i]) // cells_per_axis), 1)
+            for i in range(3)
+        )
+        self.cells_per_axis = (cells_per_axis,) * 3
+        self.cells = {}
+        self.cell_indices = {}
+        self.cuboids = []
+        self._bounds = None
+        self._cell_arrays = {}
+
+    def __len__(self):
+        return len(self.cuboids)
+
+    def cell_range(self, cuboid):
+        """
+        Returns the range of cells, along each axis, overlapped by the interior of a cuboid.
+        Cells outside the grid are clamped to its border.
+
+        Args:
+            cuboid (Cuboid): The cuboid.
+
+        Returns:
+            list: A (first, last) pair of cell indices for each axis.
+        """
+        ranges = []
+        for i in range(3):
+            offset, size = self.container.min_corner[i], self.cell_size[i]
+            first = (cuboid.min_corner[i] - offset) // size
+            last = -((offset - cuboid.max_corner[i]) // size) - 1
+            ranges.append((int(max(first, 0)), int(min(max(last, first), self.cells_per_axis[i] - 1))))
+        return ranges
+
+    def insert(self, cuboid):
+        """
+        Adds a cuboid to the index.
+
+        Args:
+            cuboid (Cuboid): The cuboid to add.
+        """
+        cuboid_ind = len(self.cuboids)
+        self.cuboids.append(cuboid)
+        self._bounds = None
+        (x0, x1), (y0, y1), (z0, z1) = self.cell_range(cuboid)
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                for k in range(z0, z1 + 1):
+                    self.cells.setdefault((i, j, k), []).append(cuboid)
+                    self.cell_indices.setdefault((i, j, k), []).append(cuboid_ind)
+                    self._cell_arrays.pop((i, j, k), None)
+
+    def query(self, cuboid):
+        """
+        Returns the cuboids that share at least one cell with a cuboid. Every cuboid intersecting
+        it is among them.
+
+        Args:
+            cuboid (Cuboid): The queried cuboid.
+
+        Returns:
+            list: The nearby cuboids, without duplicates.
+        """
+        (x0, x1), (y0, y1), (z0, z1) = self.cell_range(cuboid)
+        nearby = {}
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                for k in range(z0, z1 + 1):
+                    for other in self.cells.get((i, j, k), ()):
+                        nearby[id(other)] = other
+        return list(nearby.values())
+
+    def nearby_indices(self, cuboid):
+        """
+        Returns the insertion indices of the cuboids that share at least one cell with a cuboid, i.e. the rows
+        of `bounds()` that can intersect it. The index arrays of the cells are cached until they change.
+
+        Args:
+            cuboid (Cuboid): The queried cuboid.
+
+        Returns:
+            np.ndarray: The sorted indices, without duplicates.
+        """
+        (x0, x1), (y0, y1), (z0, z1) = self.cell_range(cuboid)
+        arrays = []
+        for i in range(x0, x1 + 1):
+            for j in range(y0, y1 + 1):
+                for k in range(z0, z1 + 1):
+                    cell = (i, j, k)
+                    array = self._cell_arrays.get(cell)
+                    if array is None:
+                        array = np.array(self.cell_indices.get(cell, ()), dtype=np.intp)
+                        self._cell_arrays[cell] = array
+                    arrays.append(array)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def bounds(self):
+        """
+        Returns the minimum and maximum corners of all the cuboids of the index, in insertion order.
+        The arrays are cached until the next insertion.
+
+        Returns:
+            tuple: Two (n, 3) arrays holding the minimum and the maximum corners.
+        """
+        if self._bounds is None:
+            self._bounds = cuboid_bounds(self.cuboids)
+        return self._bounds
+
+class ExtremePointSet:
+    """
+    Deduplicated set of the corner points of the cuboids in a container, used as reference points for new
+    placements. A point is dropped once every octant around it that a candidate can extend into is occupied
+    by a cuboid or lies outside the container, since any candidate built on the point would then be infeasible.
+
+    Attributes:
+        container (Cuboid): The container holding the cuboids.
+        points (dict): The extreme points (x, y, z) as keys, in insertion order.
+
+    Methods:
+        add_cuboid(cuboid, min_corners, max_corners): Updates the set after a cuboid has been placed.
+        array(): Returns the points as an (n, 3) array.
+    """
+
+    def __init__(self, container, cuboids=()):
+        """
+        Initializes an ExtremePointSet from the cuboids already in a container.
+
+        Args:
+            container (Cuboid): The container holding the cuboids.
+            cuboids (list, optional): The cuboids already placed in the container.
+        """
+        self.container = container
+        self.points = {}
+        self._array = None
+        if cuboids:
+            min_corners, max_corners = cuboid_bounds(cuboids)
+            corners = {}
+            for cuboid in cuboids:
+                for corner in cuboid.cuboid_corners():
+                    corners[tuple(corner)] = None
+            self._add_points(list(corners), min_corners, max_corners)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __contains__(self, point):
+        return point in self.points
+
+    def __repr__(self):
+        return f"ExtremePointSet({len(self.points)} points)"
+
+    def is_blocked(self, points, min_corners, max_corners):
+        """
+        Checks, for each point, if all the candidate octants around it are occupied or outside the container.
+
+        Args:
+            points (np.ndarray): (m, 3) array of points.
+            min_corners (np.ndarray): (n, 3) minimum corners of the cuboids in the container.
+            max_corners (np.ndarray): (n, 3) maximum corners of the cuboids in the container.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the point is blocked.
+        """
+        container_min = np.array(self.container.min_corner, dtype=np.int64)
+        container_max = np.array(self.container.max_corner, dtype=np.int64)
+        p = points[:, None, :]
+        # Per axis: does the cuboid cover the positive / negative side of the point
+        covers_positive = (min_corners[None, :, :] <= p) & (p < max_corners[None, :, :])
+        covers_negative = (min_corners[None, :, :] < p) & (p <= max_corners[None, :, :])
+        outside_positive = points >= container_max
+        outside_negative = points <= container_min
+
+        blocked = np.ones(len(points), dtype=bool)
+        for octant in CANDIDATE_OCTANTS:
+            covered = np.any(np.all(np.where(octant, covers_positive, covers_negative), axis=2), axis=1)
+            outside = np.any(np.where(octant, outside_positive, outside_negative), axis=1)
+            blocked &= covered | outside
+        return blocked
+
+    def _add_points(self, new_points, min_corners, max_corners):
+        new_points = [point for point in new_points if point not in self.points]
+        if new_points:
+            blocked = self.is_blocked(np.array(new_points, dtype=np.int64), min_corners, max_corners)
+            for point, point_blocked in zip(new_points, blocked.tolist()):
+                if not point_blocked:
+                    self.points[point] = None
+        self._array = None
+
+    def add_cuboid(self, cuboid, min_corners, max_corners):
+        """
+        Updates the set after a cuboid has been placed: drops the points the cuboid blocks and adds the
+        corners of the cuboid that are not blocked nor already in the set.
+
+        Args:
+            cuboid (Cuboid): The placed cuboid.
+            min_corners (np.ndarray): (n, 3) minimum corners of all the cuboids in the container, including it.
+            max_corners (np.ndarray): (n, 3) maximum corners of all the cuboids in the container, including it.
+        """
+        points = self.array()
+        touching = np.all((points >= cuboid.min_corner) & (points <= cuboid.max_corner), axis=1)
+        touching_ind = np.flatnonzero(touching)
+        if len(touching_ind):
+            blocked = self.is_blocked(points[touching_ind], min_corners, max_corners)
+            for point in points[touching_ind[blocked]].tolist():
+                del self.points[tuple(point)]
+        self._add_points([tuple(corner) for corner in cuboid.cuboid_corners()], min_corners, max_corners)
+
+    def array(self):
+        """
+        Returns the extreme points, in insertion order. The array is cached until the set changes.
+
+        Returns:
+            np.ndarray: (n, 3) array of points.
+        """
+        if self._array is None:
+            self._array = np.array(list(self.points), dtype=np.int64).reshape(-1, 3)
+        return self._array
+
+def cuboid_bounds(cuboids):
+    """
+    Returns the minimum and maximum corners of a list of cuboids as arrays.
+
+    Args:
+        cuboids (list): List of Cuboid objects.
+
+    Returns:
+        tuple: Two (n, 3) arrays holding the minimum and the maximum corners.
     """
-    Finds a suitable placement for a new cuboid inside a larger cuboid without overlap.
+    min_corners = np.array([cuboid.min_corner for cuboid in cuboids], dtype=np.int64).reshape(-1, 3)
+    max_corners = np.array([cuboid.max_corner for cuboid in cuboids], dtype=np.int64).reshape(-1, 3)
+    return min_corners, max_corners
+
+def pairwise_overlaps(origins, size, min_corners, max_corners):
+    """
+    Tests cuboids of the same size, at several origins, against a set of cuboids with broadcasting, in chunks of
+    at most BATCH_PAIRS_PER_CHUNK pairs.
 
     Args:
-        new_cuboid_size (tuple): Dimensions (length, width, height) of the new cuboid.
+        origins (np.ndarray): (m, 3) origins of the tested cuboids.
+        size (np.ndarray): Size of the tested cuboids.
+        min_corners (np.ndarray): (n, 3) minimum corners of the cuboids tested against.
+        max_corners (np.ndarray): (n, 3) maximum corners of the cuboids tested against.
+
+    Returns:
+        np.ndarray: Boolean mask, True where the tested cuboid intersects one of the cuboids.
+    """
+    overlaps = np.zeros(len(origins), dtype=bool)
+    n_cuboids = len(min_corners)
+    PROFILER.count("placement.intersections_evaluated", len(origins) * n_cuboids)
+    if not n_cuboids:
+        return overlaps
+    chunk = max(1, BATCH_PAIRS_PER_CHUNK // n_cuboids)
+    for start in range(0, len(origins), chunk):
+        chunk_origins = origins[start:start + chunk]
+        ends = chunk_origins + size
+        overlaps[start:start + chunk] = np.any(
+            np.all((ends[:, None, :] > min_corners[None, :, :]) & (chunk_origins[:, None, :] < max_corners[None, :, :]), axis=2),
+            axis=1
+        )
+    return overlaps
+
+def grid_overlaps(origins, size, index, min_corners, max_corners):
+    """
+    Same as pairwise_overlaps, with the cuboids of a spatial index: the origins are grouped by the cell they lie in,
+    and every group is only tested against the cuboids sharing a cell with the box spanned by the group.
+
+    Args:
+        origins (np.ndarray): (m, 3) origins of the tested cuboids.
+        size (np.ndarray): Size of the tested cuboids.
+        index (CuboidGrid): Spatial index of the cuboids tested against.
+        min_corners (np.ndarray): (n, 3) minimum corners of the cuboids of the index, from `index.bounds()`.
+        max_corners (np.ndarray): (n, 3) maximum corners of the cuboids of the index, from `index.bounds()`.
+
+    Returns:
+        np.ndarray: Boolean mask, True where the tested cuboid intersects one of the cuboids.
+    """
+    cells_per_axis = np.array(index.cells_per_axis, dtype=np.int64)
+    cells = np.clip((origins - np.array(index.container.min_corner, dtype=np.int64)) // np.array(index.cell_size, dtype=np.int64),
+                    0, cells_per_axis - 1)
+    cell_ids = (cells[:, 0] * cells_per_axis[1] + cells[:, 1]) * cells_per_axis[2] + cells[:, 2]
+    order = np.argsort(cell_ids, kind="stable")
+    group_starts = np.flatnonzero(np.diff(cell_ids[order], prepend=-1))
+
+    overlaps = np.zeros(len(origins), dtype=bool)
+    for start, end in zip(group_starts.tolist(), group_starts[1:].tolist() + [len(order)]):
+        group = order[start:end]
+        group_origins = origins[group]
+        span = Cuboid(tuple(group_origins.min(axis=0).tolist()), tuple((group_origins.max(axis=0) + size).tolist()))
+        nearby = index.nearby_indices(span)
+        overlaps[group] = pairwise_overlaps(group_origins, size, min_corners[nearby], max_corners[nearby])
+    return overlaps
+
+def find_placement_batch(new_cuboid_sizes, larger_cuboid, existing_cuboids, index=None, extreme_points=None):
+    """
+    Finds a suitable placement for a new cuboid, trying several sizes (orientations) in turn. Candidate origins
+    are generated around every reference point, offset by the size along the axes of CANDIDATE_OFFSETS. All the
+    candidates, for all reference points and all sizes, are generated in one array and tested for containment at
+    once; overlap is then tested with broadcasting, one size at a time, until a size has a feasible placement.
+
+    For every size tried, the 8 candidates of each reference point are visited in an order drawn with
+    `random.shuffle`, one shuffle per reference point whether or not it has a feasible candidate. The feasible
+    candidates are listed in that order, and one of them is picked with `np.random.randint`. The placement chosen
+    thus only depends on the seeds of `random` and `np.random`.
+
+    Args:
+        new_cuboid_sizes (list): Dimensions (length, width, height) of the new cuboid, in the order to try them.
         larger_cuboid (Cuboid): The larger cuboid container.
         existing_cuboids (list): List of existing Cuboid objects already placed inside the container.
+        index (CuboidGrid, optional): Spatial index of `existing_cuboids`, used for its cached corner arrays. If
+            the container holds at least GRID_MIN_CUBOIDS cuboids, the candidates are grouped by the cell of their
+            origin and each group is only tested against the cuboids in the cells it spans.
+        extreme_points (ExtremePointSet, optional): Extreme points of `existing_cuboids`. If given, candidates are
+            generated around these points instead of around every corner of every existing cuboid.
 
     Returns:
-        tuple or None: The origin (x, y, z) for placing the new cuboid if placement is possible, 
-                       or None if no valid placement is found.
+        tuple or None: The index of the size used and the origin (x, y, z) for placing the new cuboid,
+                       or None if no valid placement is found for any size.
     """
-    all_existing_corners = []
-    for cuboid in existing_cuboids:
-        all_existing_corners.extend(cuboid.cuboid_corners())
-
-    possible_corners_output = []
-
-    for possible_corner in all_existing_corners:
-        possible_corners = [
-            possible_corner,
-            tuple(possible_corner[i] - new_cuboid_size[i] for i in range(3)),
-            (possible_corner[0], possible_corner[1], possible_corner[2] - new_cuboid_size[2]),
-            (possible_corner[0] - new_cuboid_size[0], possible_corner[1] - new_cuboid_size[1], possible_corner[2]),
-            (possible_corner[0], possible_corner[1] - new_cuboid_size[1], possible_corner[2]),
-            (possible_corner[0] - new_cuboid_size[0], possible_corner[1], possible_corner[2]),
-            (possible_corner[0], possible_corner[1], possible_corner[2] - new_cuboid_size[2]),
-            (possible_corner[0] - new_cuboid_size[0], possible_corner[1], possible_corner[2] - new_cuboid_size[2]),
-        ]
-        random.shuffle(possible_corners)
-
-        for pc in possible_corners:
-            new_cuboid = Cuboid(pc, tuple(pc[i] + new_cuboid_size[i] for i in range(3)))
-            if not new_cuboid.fits_inside(larger_cuboid):
-                continue
-            for cuboid in existing_cuboids:
-                if new_cuboid.intersects(cuboid):
-                    break
-            else:
-                possible_corners_output.append(pc)
+    min_corners, max_corners = index.bounds() if index is not None else cuboid_bounds(existing_cuboids)
+    use_grid = index is not None and len(index) >= GRID_MIN_CUBOIDS
+    sizes = np.array(new_cuboid_sizes, dtype=np.int64)
+    n_sizes, n_cuboids = len(sizes), len(min_corners)
 
-    if possible_corners_output:
-        return possible_corners_output[np.random.randint(len(possible_corners_output))]
+    # (n_corners, 3) reference points, then (n_sizes, n_corners, 8, 3) candidate origins
+    if extreme_points is not None:
+        corners = extreme_points.array()
     else:
-        return None
+        corners = np.where(CORNER_SELECTORS[None, :, :], max_corners[:, None, :], min_corners[:, None, :]).reshape(-1, 3)
+    n_corners = len(corners)
+    PROFILER.count("placement.calls")
+    PROFILER.observe("placement.reference_points", n_corners)
+    candidates = corners[None, :, None, :] - CANDIDATE_OFFSETS[None, None, :, :] * sizes[:, None, None, :]
+
+    container_min = np.array(larger_cuboid.min_corner, dtype=np.int64)
+    container_max = np.array(larger_cuboid.max_corner, dtype=np.int64)
+    feasible = (np.all(candidates >= container_min, axis=3) &
+                np.all(candidates + sizes[:, None, None, :] <= container_max, axis=3))
+
+    for size_ind in range(n_sizes):
+        # Overlap tests, once per distinct origin among the candidates that fit in the container
+        size_feasible = feasible[size_ind]
+        inside_ind = np.flatnonzero(size_feasible)
+        PROFILER.count("placement.sizes_tried")
+        PROFILER.count("placement.candidates_tested", len(inside_ind))
+        if len(inside_ind) and n_cuboids:
+            unique_origins, inverse = np.unique(candidates[size_ind].reshape(-1, 3)[inside_ind], axis=0, return_inverse=True)
+            if use_grid:
+                overlaps = grid_overlaps(unique_origins, sizes[size_ind], index, min_corners, max_corners)
+            else:
+                overlaps = pairwise_overlaps(unique_origins, sizes[size_ind], min_corners, max_corners)
+            size_feasible.reshape(-1)[inside_ind] = ~overlaps[inverse.reshape(-1)]
+
+        possible_corners_output = []
+        for corner_ind, corner_feasible in enumerate(size_feasible.tolist()):
+            order = list(range(8))
+            random.shuffle(order)
+            if any(corner_feasible):
+                possible_corners_output.extend((corner_ind, k) for k in order if corner_feasible[k])
+        if possible_corners_output:
+            corner_ind, k = possible_corners_output[np.random.randint(len(possible_corners_output))]
+            return size_ind, tuple(int(v) for v in candidates[size_ind, corner_ind, k])
+    return None
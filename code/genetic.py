@@ -1,9 +1,16 @@
 import math
+import time
 import random
+import zlib
+import itertools
+import signal
+import multiprocessing
 import numpy as np
-from copy import deepcopy
+from collections import OrderedDict, deque
+from copy import copy
 from validator import *
 from genetic_to_package import *
+from profiling import PROFILER, profiled
 
 class EMS:
     """
@@ -111,20 +118,118 @@ class EMS:
 
         return is_outside
 
-def prioritize_ems(ems_list):
+EMS_DTYPE = np.dtype([('origin', np.int64, (3,)), ('extent', np.int64, (3,))])
+
+
+class EMSStore:
+    """
+    EMSStore holds all the empty spaces of a container in a single structured NumPy array, so that
+    splitting, filtering and ordering them can be done with vectorized operations.
+
+    Attributes:
+        spaces (np.ndarray): Structured array of dtype EMS_DTYPE. Each row holds the origin of an EMS and its
+            extents (length, height, width) along the x, y and z axes.
+    """
+    def __init__(self, spaces=None):
+        """
+        Initializes an EMSStore object.
+
+        Args:
+            spaces (np.ndarray, optional): Structured array of dtype EMS_DTYPE. Defaults to an empty store.
+        """
+        self.spaces = np.zeros(0, dtype=EMS_DTYPE) if spaces is None else spaces
+
+    @classmethod
+    def for_container(cls, container):
+        """
+        Creates a store holding a single EMS that spans the whole container.
+
+        Args:
+            container (Container): The container whose volume is empty.
+
+        Returns:
+            EMSStore: The new store.
+        """
+        spaces = np.zeros(1, dtype=EMS_DTYPE)
+        spaces['origin'][0] = container.origin
+        spaces['extent'][0] = (container.length, container.height, container.width)
+        return cls(spaces)
+
+    @property
+    def origins(self):
+        """
+        np.ndarray: (n, 3) view of the EMS origins.
+        """
+        return self.spaces['origin']
+
+    @property
+    def extents(self):
+        """
+        np.ndarray: (n, 3) view of the EMS extents (length, height, width).
+        """
+        return self.spaces['extent']
+
+    def __len__(self):
+        return len(self.spaces)
+
+    def __getitem__(self, index):
+        """
+        Returns a single EMS of the store as an EMS object.
+
+        Args:
+            index (int): Position of the EMS in the store.
+
+        Returns:
+            EMS: The EMS at the given position.
+        """
+        length, height, width = self.spaces['extent'][index]
+        return EMS(self.spaces['origin'][index], length, height, width)
+
+    def __iter__(self):
+        for i in range(len(self.spaces)):
+            yield self[i]
+
+    def __repr__(self):
+        """
+        String representation of the EMSStore object.
+
+        Returns:
+            str: The string representation of the EMSStore.
+        """
+        return f"EMSStore({list(self)})"
+
+    def fits(self, box):
+        """
+        Checks, for every EMS of the store, if a given box can fit in it (see EMS.if_box_fits).
+
+        Args:
+            box (Box): The box to check for fitting.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the box fits in the EMS.
+        """
+        extents = self.spaces['extent']
+        ems_length, ems_height, ems_width = extents[:, 0], extents[:, 1], extents[:, 2]
+        fit_original = (box.length <= ems_length) & (box.height <= ems_height) & (box.width <= ems_width)
+        fit_rotated1 = (box.height <= ems_length) & (box.length <= ems_height) & (box.width <= ems_width)
+        fit_rotated2 = (box.width <= ems_length) & (box.height <= ems_height) & (box.length <= ems_width)
+        return fit_original | fit_rotated1 | fit_rotated2
+
+
+def prioritize_ems(ems_store):
     """
-    Sorts a list of EMS objects based on their distance to the origin.
+    Sorts the EMS of a store based on their distance to the origin.
     
     Args:
-        ems_list (list): A list of EMS objects.
+        ems_store (EMSStore): The store of EMS.
         
     Returns:
-        list: The sorted list of EMS objects based on their distance to the origin.
+        EMSStore: A new store with the EMS sorted based on their distance to the origin.
     """
-    distances = [ems.distance_to_origin() for ems in ems_list]
+    origins = ems_store.origins
+    distances = np.sqrt(np.sum(origins**2, axis=1))
     ems_order = np.argsort(distances)
-    new_ems_list = [ems_list[i] for i in ems_order]
-    return new_ems_list
+    return EMSStore(ems_store.spaces[ems_order])
 
 class Box:
     """
@@ -136,8 +241,11 @@ class Box:
         height (int): The height of the box.
         width (int): The width of the box.
         weight (int): The weight of the box.
+        priority (bool): Whether the box is a priority package.
+        delay (int): The delay cost of leaving the box (as an economy package) unloaded.
+        index (int): Position of the box in the boxes of the genetic algorithm, used to map it back to its package.
     """
-    def __init__(self, length, height, width, origin=None, weight=0):
+    def __init__(self, length, height, width, origin=None, weight=0, priority=False, delay=0, index=None):
         """
         Initializes a Box object.
         
@@ -147,6 +255,9 @@ class Box:
             width (int): The width of the box.
             origin (list, optional): The origin coordinates of the box. Defaults to [0, 0, 0].
             weight (int, optional): The weight of the box. Defaults to 0.
+            priority (bool, optional): Whether the box is a priority package. Defaults to False.
+            delay (int, optional): The delay cost of leaving the box unloaded. Defaults to 0.
+            index (int, optional): Position of the box in the boxes of the genetic algorithm. Defaults to None.
         """
         if origin is None:
             origin = [0, 0, 0]
@@ -155,6 +266,9 @@ class Box:
         self.height = int(height)
         self.width = int(width)
         self.weight = int(weight)
+        self.priority = bool(priority)
+        self.delay = int(delay)
+        self.index = index
 
     def __repr__(self):
         """
@@ -163,7 +277,7 @@ class Box:
         Returns:
             str: The string representation of the Box.
         """
-        return f"Box(length={self.length}, height={self.height}, width={self.width}, origin={self.origin}, weight={self.weight})"
+        return f"Box(length={self.length}, height={self.height}, width={self.width}, origin={self.origin}, weight={self.weight}, priority={self.priority}, delay={self.delay}, index={self.index})"
     
     def is_equal_to_ems(self, ems):
         """
@@ -191,9 +305,13 @@ class Container:
         length (int): The length of the container.
         height (int): The height of the container.
         width (int): The width of the container.
-        ems (list): A list of EMS objects within the container.
+        ems (EMSStore): The EMS within the container.
+        capacity (float): The maximum total weight of the boxes packed in the container.
+        used_weight (int): The total weight of the boxes packed in the container so far.
+        index (int): Position of the container in the containers of the genetic algorithm, used to map it back
+            to its ULD.
     """
-    def __init__(self, length, height, width, origin=None):
+    def __init__(self, length, height, width, origin=None, capacity=None, index=None):
         """
         Initializes a Container object.
         
@@ -202,6 +320,9 @@ class Container:
             height (int): The height of the container.
             width (int): The width of the container.
             origin (list, optional): The origin coordinates of the container. Defaults to [0, 0, 0].
+            capacity (float, optional): The maximum total weight of the packed boxes. Defaults to no limit.
+            index (int, optional): Position of the container in the containers of the genetic algorithm.
+                Defaults to None.
         """
         if origin is None:
             origin = [0, 0, 0]
@@ -209,7 +330,10 @@ class Container:
         self.length = int(length)
         self.height = int(height)
         self.width = int(width)
-        self.ems = [EMS(self.origin, self.length, self.height, self.width)]
+        self.ems = EMSStore.for_container(self)
+        self.capacity = math.inf if capacity is None else capacity
+        self.used_weight = 0
+        self.index = index
 
     def __repr__(self):
         """
@@ -218,7 +342,7 @@ class Container:
         Returns:
             str: The string representation of the Container.
         """
-        return f"Container(length={self.length}, height={self.height}, width={self.width}, origin={self.origin})"
+        return f"Container(length={self.length}, height={self.height}, width={self.width}, origin={self.origin}, capacity={self.capacity})"
     
     def if_box_outside(self, box):
         """
@@ -261,6 +385,291 @@ def volume(obj):
 
 
 
+class PackingCost:
+    """
+    Running cost of a packing, as in OptimalCargoManagement.cost: K for every container holding a priority box,
+    plus the delay of every economy box left unpacked. Unpacked priority boxes cost `priority_penalty` each,
+    so that any packing of all priority boxes is cheaper than one leaving some out.
+
+    Attributes:
+        K (int): Cost of a container holding a priority box.
+        priority_penalty (int): Cost of leaving a priority box unpacked.
+        activated (list): Whether each container holds a priority box.
+        total (int): The cost of the packing so far.
+    """
+    def __init__(self, K, n_containers, boxes):
+        """
+        Initializes a PackingCost object for an empty packing, where every box is unpacked.
+
+        Args:
+            K (int): Cost of a container holding a priority box.
+            n_containers (int): Number of containers.
+            boxes (list): The list of box objects.
+        """
+        self.K = K
+        self.priority_penalty = K * (n_containers + 1)
+        self.activated = [False] * n_containers
+        self.total = sum(self.unpacked_cost(box) for box in boxes)
+
+    def __repr__(self):
+        return f"PackingCost(total={self.total}, activated={self.activated})"
+
+    def unpacked_cost(self, box):
+        """
+        Returns the cost of leaving a box unpacked.
+
+        Args:
+            box (Box): The box.
+
+        Returns:
+            int: The cost of leaving the box unpacked.
+        """
+        return self.priority_penalty if box.priority else box.delay
+
+    def place(self, container_ind, box):
+        """
+        Updates the cost after a box has been packed in a container.
+
+        Args:
+            container_ind (int): Index of the container the box was packed in.
+            box (Box): The packed box.
+        """
+        self.total -= self.unpacked_cost(box)
+        if box.priority and not self.activated[container_ind]:
+            self.activated[container_ind] = True
+            self.total += self.K
+
+    def snapshot(self):
+        """
+        Returns the state of the running cost, to be restored with `restore`.
+
+        Returns:
+            tuple: The total and the activated containers.
+        """
+        return self.total, self.activated[:]
+
+    def restore(self, state):
+        """
+        Restores a state returned by `snapshot`.
+
+        Args:
+            state (tuple): The total and the activated containers.
+        """
+        self.total, activated = state
+        self.activated = activated[:]
+
+
+class PackingState:
+    """
+    Mutable state of a chromosome being decoded: the EMS store and packed weight of every container, and the
+    placements made so far in preallocated arrays. A single state is reset before every decode, so decoding does
+    not copy the containers nor allocate a packing solution.
+
+    Every reset or restore gives the decode its own placement arrays, which are only appended to. A snapshot
+    therefore keeps references to the arrays and the number of placements, instead of copying them.
+
+    Attributes:
+        containers (list): The container objects (left untouched).
+        boxes (list): The box objects (left untouched).
+        placed (np.ndarray): Placement flag of every box.
+        n_placed (int): Number of placements made so far.
+        box_indices (np.ndarray): Index of the box of every placement, the first n_placed entries being set.
+        container_indices (np.ndarray): Index of the container of every placement.
+        origins (np.ndarray): (n_boxes, 3) origin of every placement.
+        extents (np.ndarray): (n_boxes, 3) extents (length, height, width) of every placement.
+        ems (list): EMSStore of every container.
+        used_weight (list): Weight packed in every container.
+    """
+    def __init__(self, containers, boxes):
+        """
+        Initializes a PackingState object, with every container empty.
+
+        Args:
+            containers (list): The container objects.
+            boxes (list): The box objects.
+        """
+        self.containers = containers
+        self.boxes = boxes
+        self.placed = np.zeros(len(boxes), dtype=bool)
+        # EMS stores are never modified in place, so the empty stores can be shared by every decode
+        self.empty_ems = [EMSStore.for_container(c) for c in containers]
+        self.reset()
+
+    def __repr__(self):
+        return f"PackingState(n_placed={self.n_placed}, n_boxes={len(self.boxes)}, n_containers={len(self.containers)})"
+
+    def new_placement_arrays(self):
+        """
+        Allocates the placement arrays of a new decode, leaving the previous ones to the snapshots holding them.
+        """
+        n_boxes = len(self.boxes)
+        self.box_indices = np.empty(n_boxes, dtype=np.int64)
+        self.container_indices = np.empty(n_boxes, dtype=np.int64)
+        self.origins = np.empty((n_boxes, 3), dtype=np.int64)
+        self.extents = np.empty((n_boxes, 3), dtype=np.int64)
+
+    def reset(self):
+        """
+        Empties every container.
+        """
+        self.new_placement_arrays()
+        self.placed[:] = False
+        self.n_placed = 0
+        self.ems = self.empty_ems[:]
+        self.used_weight = [0] * len(self.containers)
+
+    def can_carry(self, container_ind, box):
+        """
+        Checks if a container can take the weight of a given box on top of the boxes already packed.
+
+        Args:
+            container_ind (int): Index of the container.
+            box (Box): The box to check.
+
+        Returns:
+            bool: True if the box keeps the container within its capacity, False otherwise.
+        """
+        return self.used_weight[container_ind] + box.weight <= self.containers[container_ind].capacity
+
+    def place(self, container_ind, box_ind, placed_box):
+        """
+        Records the placement of a box in a container.
+
+        Args:
+            container_ind (int): Index of the container.
+            box_ind (int): Index of the box.
+            placed_box (Box): The box, rotated and positioned as placed.
+        """
+        i = self.n_placed
+        self.placed[box_ind] = True
+        self.box_indices[i] = box_ind
+        self.container_indices[i] = container_ind
+        self.origins[i] = placed_box.origin
+        self.extents[i] = (placed_box.length, placed_box.height, placed_box.width)
+        self.used_weight[container_ind] += placed_box.weight
+        self.n_placed = i + 1
+
+    def snapshot(self):
+        """
+        Returns the state, to be restored with `restore`. The placement arrays are referenced, not copied:
+        the placements made after the snapshot go past its number of placements.
+
+        Returns:
+            tuple: The number of placements, the placement arrays, the EMS stores and the packed weights.
+        """
+        return (self.n_placed, self.box_indices, self.container_indices, self.origins, self.extents,
+                self.ems[:], self.used_weight[:])
+
+    def restore(self, snapshot):
+        """
+        Restores a state returned by `snapshot`, into new placement arrays.
+
+        Args:
+            snapshot (tuple): The state.
+        """
+        n, box_indices, container_indices, origins, extents, ems, used_weight = snapshot
+        self.new_placement_arrays()
+        self.n_placed = n
+        self.box_indices[:n] = box_indices[:n]
+        self.container_indices[:n] = container_indices[:n]
+        self.origins[:n] = origins[:n]
+        self.extents[:n] = extents[:n]
+        self.placed[:] = False
+        self.placed[self.box_indices[:n]] = True
+        self.ems = ems[:]
+        self.used_weight = used_weight[:]
+
+    def packing(self):
+        """
+        Returns the placements made so far as a Packing, independent of the state.
+
+        Returns:
+            Packing: The packing.
+        """
+        n = self.n_placed
+        return Packing(self.box_indices[:n].copy(), self.container_indices[:n].copy(), self.origins[:n].copy(),
+                       self.extents[:n].copy(), self.ems[:], self.used_weight[:])
+
+
+class Packing:
+    """
+    Compact result of a decode: the placements as arrays, in placement order. It is turned into the list
+    representation of a packing solution only when needed.
+
+    Attributes:
+        box_indices (np.ndarray): Index of the box of every placement.
+        container_indices (np.ndarray): Index of the container of every placement.
+        origins (np.ndarray): (n_placed, 3) origin of every placement.
+        extents (np.ndarray): (n_placed, 3) extents (length, height, width) of every placement.
+        ems (list): Final EMSStore of every container.
+        used_weight (list): Weight packed in every container.
+    """
+    def __init__(self, box_indices, container_indices, origins, extents, ems, used_weight):
+        """
+        Initializes a Packing object.
+
+        Args:
+            box_indices (np.ndarray): Index of the box of every placement.
+            container_indices (np.ndarray): Index of the container of every placement.
+            origins (np.ndarray): (n_placed, 3) origin of every placement.
+            extents (np.ndarray): (n_placed, 3) extents of every placement.
+            ems (list): Final EMSStore of every container.
+            used_weight (list): Weight packed in every container.
+        """
+        self.box_indices = box_indices
+        self.container_indices = container_indices
+        self.origins = origins
+        self.extents = extents
+        self.ems = ems
+        self.used_weight = used_weight
+
+    def __len__(self):
+        return len(self.box_indices)
+
+    def __repr__(self):
+        return f"Packing(n_placed={len(self)}, n_containers={len(self.ems)})"
+
+    def volume_fitness(self, containers):
+        """
+        Computes GeneticAlgorithm.fitness_score of the packing without building the packing solution.
+
+        Args:
+            containers (list): The container objects.
+
+        Returns:
+            float: The fitness score of the packing.
+        """
+        used_containers = set(self.container_indices.tolist())
+        container_volume = sum(volume(containers[c]) for c in used_containers)
+        boxes_volume = int(np.prod(self.extents, axis=1).sum())
+        return 1 - (boxes_volume / container_volume)
+
+    def packing_solution(self, containers, boxes):
+        """
+        Builds the packing solution: for every container, a copy of it followed by its packed boxes in
+        placement order.
+
+        Args:
+            containers (list): The container objects.
+            boxes (list): The box objects.
+
+        Returns:
+            list: The packing solution (list of containers with packed boxes).
+        """
+        packing_solution = []
+        for container, ems, used_weight in zip(containers, self.ems, self.used_weight):
+            packed_container = copy(container)
+            packed_container.ems = ems
+            packed_container.used_weight = used_weight
+            packing_solution.append([packed_container])
+        for box_ind, container_ind, origin, (length, height, width) in zip(self.box_indices.tolist(), self.container_indices.tolist(),
+                                                                          self.origins.tolist(), self.extents.tolist()):
+            box = boxes[box_ind]
+            packing_solution[container_ind].append(Box(length, height, width, origin=origin, weight=box.weight,
+                                                       priority=box.priority, delay=box.delay, index=box_ind))
+        return packing_solution
+
+
 class Chromosome:   
     def __init__(self, bps, cls):
         """
@@ -298,21 +707,360 @@ class Chromosome:
         return self.container_loading_sequence
 
 
+class DecodingCheckpoint:
+    """
+    Snapshot of a partially decoded chromosome, taken just before a given step of the decoding loop.
+
+    Attributes:
+        con_i (int): Position in the container loading sequence.
+        box_i (int): Position in the box packing sequence.
+        state (tuple): Snapshot of the PackingState.
+        cost_state (tuple): Snapshot of the running PackingCost, or None if the cost was not tracked.
+    """
+    def __init__(self, con_i, box_i, packing_state, packing_cost=None):
+        """
+        Initializes a DecodingCheckpoint object.
+
+        Args:
+            con_i (int): Position in the container loading sequence.
+            box_i (int): Position in the box packing sequence.
+            packing_state (PackingState): The state of the decode.
+            packing_cost (PackingCost, optional): The running cost of the packing.
+        """
+        self.con_i = con_i
+        self.box_i = box_i
+        self.state = packing_state.snapshot()
+        self.cost_state = packing_cost.snapshot() if packing_cost is not None else None
+
+    def is_valid_for(self, bps_prefix, cls_prefix, n_boxes, needs_cost=False):
+        """
+        Checks if the decoding state at this checkpoint is shared by a chromosome. Up to the end of the first
+        container the state only depends on the first container and the prefix of the box packing sequence;
+        past it, it depends on the whole box packing sequence and on the containers loaded so far.
+
+        Args:
+            bps_prefix (int): Length of the box packing sequence prefix shared with the chromosome.
+            cls_prefix (int): Length of the container loading sequence prefix shared with the chromosome.
+            n_boxes (int): Number of boxes.
+            needs_cost (bool, optional): Whether the running cost has to be restored too. Defaults to False.
+
+        Returns:
+            bool: True if the chromosome can resume decoding from this checkpoint.
+        """
+        if needs_cost and self.cost_state is None:
+            return False
+        containers_needed = self.con_i + (1 if self.box_i > 0 else 0)
+        boxes_needed = self.box_i if self.con_i == 0 else n_boxes
+        return cls_prefix >= containers_needed and bps_prefix >= boxes_needed
+
+    def restore(self, packing_state, packing_cost=None):
+        """
+        Restores the decoding state at this checkpoint.
+
+        Args:
+            packing_state (PackingState): The state restored to this checkpoint.
+            packing_cost (PackingCost, optional): Running cost restored to its state at this checkpoint.
+        """
+        packing_state.restore(self.state)
+        if packing_cost is not None:
+            packing_cost.restore(self.cost_state)
+
+
+def common_prefix_length(sequence1, sequence2):
+    """
+    Returns the length of the common prefix of two sequences of the same length.
+
+    Args:
+        sequence1 (np.ndarray): The first sequence.
+        sequence2 (np.ndarray): The second sequence.
+
+    Returns:
+        int: Length of the common prefix.
+    """
+    mismatches = np.flatnonzero(sequence1 != sequence2)
+    return int(mismatches[0]) if len(mismatches) else len(sequence1)
+
+
+class IncrementalDecoder:
+    """
+    Decodes chromosomes like GeneticAlgorithm.pack_boxes, but resumes from checkpoints of previously decoded
+    chromosomes that share a prefix with the chromosome, so only the changed suffix is replayed.
+
+    Attributes:
+        ga (GeneticAlgorithm): The genetic algorithm whose boxes and containers are decoded.
+        checkpoint_interval (int): Number of box packing positions between two checkpoints.
+        history (deque): The last decoded chromosomes, as (bps, cls, checkpoints) triples.
+        state (PackingState): The decoding state, reused by every decode.
+    """
+    def __init__(self, ga, checkpoint_interval=16, history_size=32):
+        """
+        Initializes an IncrementalDecoder object.
+
+        Args:
+            ga (GeneticAlgorithm): The genetic algorithm whose boxes and containers are decoded.
+            checkpoint_interval (int, optional): Number of box packing positions between two checkpoints.
+                Defaults to 16.
+            history_size (int, optional): Number of decoded chromosomes whose checkpoints are kept. Defaults to 32.
+        """
+        self.ga = ga
+        self.checkpoint_interval = checkpoint_interval
+        self.history = deque(maxlen=history_size)
+        self.state = PackingState(ga.uld_dimensions, ga.package_dimensions)
+
+    def find_checkpoint(self, bps, cls, needs_cost=False):
+        """
+        Finds the furthest checkpoint, among the decoded chromosomes, from which a chromosome can resume.
+
+        Args:
+            bps (np.ndarray): The box packing sequence.
+            cls (np.ndarray): The container loading sequence.
+            needs_cost (bool, optional): Whether the checkpoint must hold the running cost. Defaults to False.
+
+        Returns:
+            tuple: The checkpoint (or None to decode from scratch) and the checkpoints up to and including it.
+        """
+        n_boxes = len(bps)
+        best_checkpoint, best_checkpoints = None, []
+        for decoded_bps, decoded_cls, checkpoints in self.history:
+            bps_prefix = common_prefix_length(decoded_bps, bps)
+            cls_prefix = common_prefix_length(decoded_cls, cls)
+            for i in range(len(checkpoints) - 1, -1, -1):
+                checkpoint = checkpoints[i]
+                if best_checkpoint is not None and (checkpoint.con_i, checkpoint.box_i) <= (best_checkpoint.con_i, best_checkpoint.box_i):
+                    break
+                if checkpoint.is_valid_for(bps_prefix, cls_prefix, n_boxes, needs_cost):
+                    best_checkpoint, best_checkpoints = checkpoint, checkpoints[:i + 1]
+                    break
+        return best_checkpoint, best_checkpoints
+
+    def decode(self, box_packing_sequence, container_loading_sequence, packing_cost=None):
+        """
+        Decode a chromosome into a packing, identical to the one returned by GeneticAlgorithm.decode_chromosome
+        without incremental decoding.
+
+        Args:
+            box_packing_sequence (list): The sequence of boxes to be packed.
+            container_loading_sequence (list): The sequence of containers to be loaded.
+            packing_cost (PackingCost, optional): Running cost of an empty packing, updated as boxes are packed.
+
+        Returns:
+            Packing: The packing.
+        """
+        n_containers, n_boxes = len(self.ga.uld_dimensions), len(self.ga.package_dimensions)
+        bps = np.asarray(box_packing_sequence)
+        cls = np.asarray(container_loading_sequence)
+        state = self.state
+
+        checkpoint, checkpoints = self.find_checkpoint(bps, cls, packing_cost is not None)
+        if checkpoint is None:
+            state.reset()
+            start_con_i, start_box_i = 0, 0
+            PROFILER.count("ga.decoder_full_decodes")
+        else:
+            checkpoint.restore(state, packing_cost)
+            start_con_i, start_box_i = checkpoint.con_i, checkpoint.box_i
+            PROFILER.count("ga.decoder_checkpoint_hits")
+
+        placed = state.placed
+        for con_i in range(start_con_i, n_containers):
+            container_ind = container_loading_sequence[con_i] -1
+            for box_i in range(start_box_i if con_i == start_con_i else 0, n_boxes):
+                if box_i % self.checkpoint_interval == 0 and (con_i, box_i) != (start_con_i, start_box_i):
+                    checkpoints.append(DecodingCheckpoint(con_i, box_i, state, packing_cost))
+                box_ind = box_packing_sequence[box_i] -1
+                if placed[box_ind]:
+                    continue
+                if self.ga.place_box(state, container_ind, box_ind) and packing_cost is not None:
+                    packing_cost.place(container_ind, state.boxes[box_ind])
+
+        self.history.append((bps, cls, checkpoints))
+        return state.packing()
+
+
+class FitnessCache:
+    """
+    Bounded LRU cache of decoded chromosomes, keyed on the (bps, cls) tuple.
+
+    Attributes:
+        maxsize (int): Maximum number of chromosomes kept in the cache.
+        entries (OrderedDict): Cached (fitness, packing) pairs, least recently used first.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that required a decode.
+    """
+    def __init__(self, maxsize=128):
+        """
+        Initializes an empty FitnessCache.
+
+        Args:
+            maxsize (int, optional): Maximum number of chromosomes kept in the cache. Defaults to 128.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        """
+        String representation of the FitnessCache object.
+
+        Returns:
+            str: The string representation of the FitnessCache.
+        """
+        return f"FitnessCache(size={len(self.entries)}, maxsize={self.maxsize}, hits={self.hits}, misses={self.misses})"
+
+    @staticmethod
+    def key(bps, cls):
+        """
+        Builds the cache key of a chromosome. The sequences are copied into tuples, so later in-place
+        mutation of the chromosome does not affect the cached entry.
+
+        Args:
+            bps (list): The box packing sequence.
+            cls (list): The container loading sequence.
+
+        Returns:
+            tuple: The cache key.
+        """
+        return (tuple(bps), tuple(cls))
+
+    def get(self, key):
+        """
+        Looks up a chromosome and marks it as most recently used.
+
+        Args:
+            key (tuple): Key built by FitnessCache.key.
+
+        Returns:
+            tuple or None: The cached (fitness, packing) pair, or None on a miss.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """
+        Stores a decoded chromosome, evicting the least recently used one if the cache is full.
+
+        Args:
+            key (tuple): Key built by FitnessCache.key.
+            entry (tuple): The (fitness, packing) pair.
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+_worker_ga = None
+
+def _init_evaluation_worker(ga, profile=False):
+    """
+    Pool initializer: keeps the GeneticAlgorithm (and with it the boxes and containers) in the worker,
+    so that only chromosomes have to be sent for every evaluation.
+
+    Interrupts are left to the parent process, which terminates the pool.
+
+    Parameters:
+    ga (GeneticAlgorithm): The genetic algorithm instance whose chromosomes are evaluated.
+    profile (bool, optional): Whether the worker records profiling counters, sent back with every evaluation.
+    """
+    global _worker_ga
+    _worker_ga = ga
+    if profile:
+        PROFILER.enable()
+    else:
+        PROFILER.disable()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def _evaluate_in_worker(chromosome_sequences):
+    """
+    Evaluates a single (bps, cls) pair inside a pool worker.
+
+    Parameters:
+    chromosome_sequences (tuple): The box packing sequence and the container loading sequence.
+
+    Returns:
+    tuple: The fitness score and the Packing of the chromosome, and the profiling records of the evaluation
+    (None if profiling is disabled).
+    """
+    bps, cls = chromosome_sequences
+    if not PROFILER.enabled:
+        return _worker_ga.evaluate_chromosome(bps, cls), None
+    PROFILER.reset()
+    return _worker_ga.evaluate_chromosome(bps, cls), PROFILER.records()
+
+
+def order_crossover(parent1, parent2, cut_i, cut_j):
+    """
+    Order crossover (OX) of two permutations, in linear time. The child keeps the genes of parent1 in positions
+    cut_i+1 to cut_j, and the other positions are filled, starting after cut_j and wrapping around, with the
+    missing genes in the order they appear in parent2.
+
+    Args:
+        parent1 (list): The permutation whose segment is kept.
+        parent2 (list): The permutation giving the order of the remaining genes.
+        cut_i (int): The segment starts after this position.
+        cut_j (int): The segment ends at this position.
+
+    Returns:
+        list: The child permutation.
+    """
+    segment = parent1[cut_i + 1:cut_j + 1]
+    kept = set(segment)
+    missing = [g for g in parent2 if g not in kept]
+    n_tail = len(parent1) - cut_j - 1
+    return missing[n_tail:] + list(segment) + missing[:n_tail]
+
+
 class GeneticAlgorithm(object):
-    def __init__(self, uld_dimensions, package_dimensions, verbose=False):
+    def __init__(self, uld_dimensions, package_dimensions, verbose=False, n_workers=1, seed=0, cache_size=128, incremental=True,
+                 fitness_mode="volume", K=0):
         """
         Initialize the GeneticAlgorithm object.
 
         Parameters:
-        uld_dimensions (list): List of ULD dimensions (length, width, height).
-        package_dimensions (list): List of package dimensions (length, width, height).
+        uld_dimensions (list): List of ULD dimensions (length, width, height), optionally followed by the
+            weight capacity of the ULD (after its ID).
+        package_dimensions (list): List of package dimensions (length, width, height), optionally followed by
+            the priority flag, the delay and the weight of the package (after its ID).
         verbose (bool): Whether to print detailed logs.
-        """
+        n_workers (int): Number of worker processes used to evaluate a population. 1 evaluates serially,
+            None uses all available cores.
+        seed (int): Base seed from which the per-chromosome evaluation seeds are derived.
+        cache_size (int): Maximum number of decoded chromosomes kept in the fitness cache.
+        incremental (bool): Whether chromosomes are decoded by resuming from the longest prefix shared with a
+            previously decoded chromosome.
+        fitness_mode (str): "volume" scores a packing by its unused container volume, "cost" by its cost
+            (see PackingCost).
+        K (int): Cost of a container holding a priority box, used in "cost" mode.
+        """
+        if fitness_mode not in ("volume", "cost"):
+            raise ValueError(f"Unknown fitness mode: {fitness_mode}")
+        self.fitness_mode = fitness_mode
+        self.K = K
         self.verbose = verbose
-        self.uld_dimensions = [Container(length=c[0], width=c[1], height=c[2]) for c in uld_dimensions]
-        self.package_dimensions = [Box(length=b[0], width=b[1], height=b[2]) for b in package_dimensions]
+        self.n_workers = n_workers if n_workers is not None else (multiprocessing.cpu_count() or 1)
+        self.seed = seed
+        self.fitness_cache = FitnessCache(maxsize=cache_size)
+        self.uld_dimensions = [Container(length=c[0], width=c[1], height=c[2], capacity=c[4] if len(c) > 4 else None, index=i)
+                               for i, c in enumerate(uld_dimensions)]
+        self.package_dimensions = [Box(length=b[0], width=b[1], height=b[2], priority=b[4] if len(b) > 4 else False,
+                                       delay=b[5] if len(b) > 5 else 0, weight=b[6] if len(b) > 6 else 0, index=i)
+                                   for i, b in enumerate(package_dimensions)]
+        self.uld_ids = [uld[3] for uld in uld_dimensions]
+        self.package_ids = [package[3] for package in package_dimensions]
         self.uld_dimensions_dict = {uld[3]: (uld[0], uld[1], uld[2]) for uld in uld_dimensions}
         self.package_dimensions_dict = {package[3]: (package[0], package[1], package[2]) for package in package_dimensions}
+        self.packing_state = PackingState(self.uld_dimensions, self.package_dimensions)
+        self.decoder = IncrementalDecoder(self) if incremental else None
 
     def log(self, message):
         """
@@ -349,111 +1097,86 @@ class GeneticAlgorithm(object):
         fitness = 1 - (boxes_volume / container_volume)
         return fitness
 
-    def EMS_list(self, container, box):
+    def EMS_list(self, ems_store, box):
         """
-        Generate a list of possible empty spaces (EMS) where a box can be placed inside a container.
+        Generate the empty spaces (EMS) left around a box inside each EMS of a store. Every EMS the box
+        intersects is split into up to six new EMS, one on each side of the box.
 
         Parameters:
-        container (Container): The container object.
+        ems_store (EMSStore): The store of EMS.
         box (Box): The box object.
 
         Returns:
-        list: A list of valid EMS objects.
-        """
-        if container.if_box_outside(box):
-            return []
-
-        ems_list = []
-        container_end = np.array([container.origin[0] + container.length, 
-                                  container.origin[1] + container.height, 
-                                  container.origin[2] + container.width])
-
-        ems_candidates = [
-            EMS(origin=container.origin, 
-                length=box.origin[0] - container.origin[0], 
-                height=container.height, 
-                width=container.width),
-            EMS(origin=container.origin, 
-                length=container.length, 
-                height=container.height, 
-                width=box.origin[2] - container.origin[2]),
-            EMS(origin=np.array([box.origin[0]+box.length, container.origin[1], container.origin[2]]),
-                length=container.origin[0] + container.length - (box.origin[0] + box.length), 
-                height=container.height, 
-                width=container.width),
-            EMS(origin=np.array([container.origin[0], container.origin[1], box.origin[2]+box.width]),
-                length=container.length, 
-                height=container.height, 
-                width=container_end[2] - (box.origin[2] + box.width)),
-            EMS(origin=np.array([container.origin[0], box.origin[1]+box.height, container.origin[2]]),
-                length=container.length, 
-                height=container_end[1] - (box.origin[1] + box.height), 
-                width=container.width),
-            EMS(origin=container.origin, 
-                length=container.length, 
-                height=box.origin[1] - container.origin[1], 
-                width=container.width)
-        ]
+        tuple: A structured array of the new valid EMS, ordered by parent EMS and then by side, and a boolean
+            mask of the EMS that produced at least one of them.
+        """
+        origins = ems_store.origins
+        extents = ems_store.extents
+        ends = origins + extents
+        box_end = box.origin + np.array([box.length, box.height, box.width])
+
+        is_outside = np.any((origins >= box_end) | (ends <= box.origin), axis=1)
+
+        # Sides in the original candidate order: x low, z low, x high, z high, y high, y low
+        n_spaces = len(ems_store)
+        candidates = np.zeros((n_spaces, 6), dtype=EMS_DTYPE)
+        for side, (axis, is_high) in enumerate([(0, False), (2, False), (0, True), (2, True), (1, True), (1, False)]):
+            candidate_origins = origins.copy()
+            candidate_extents = extents.copy()
+            if is_high:
+                candidate_origins[:, axis] = box_end[axis]
+                candidate_extents[:, axis] = ends[:, axis] - box_end[axis]
+            else:
+                candidate_extents[:, axis] = box.origin[axis] - origins[:, axis]
+            candidates['origin'][:, side] = candidate_origins
+            candidates['extent'][:, side] = candidate_extents
 
-        ems_list = [ems for ems in ems_candidates if (ems).is_valid()]
-        return ems_list
+        is_valid = np.all(candidates['extent'] > 0, axis=2) & ~is_outside[:, None]
+        return candidates[is_valid], np.any(is_valid, axis=1)
     
-    def update_ems(self, ems_list, box):
+    def update_ems(self, ems_store, box):
         """
-        Update the list of empty spaces (EMS) after placing a box in the container.
+        Update the store of empty spaces (EMS) after placing a box in the container.
 
         Parameters:
-        ems_list (list): The current list of EMS objects.
+        ems_store (EMSStore): The current store of EMS.
         box (Box): The box that has been placed.
 
         Returns:
-        list: The updated list of EMS objects.
+        EMSStore: The updated store of EMS.
         """
-        new_ems_list = ems_list[:]
-        ind_to_remove = []
+        new_spaces, is_split = self.EMS_list(ems_store, box)
+        is_equal_to_box = (np.all(ems_store.origins == box.origin, axis=1) &
+                           np.all(ems_store.extents == (box.length, box.height, box.width), axis=1))
+        to_remove = is_split | is_equal_to_box
 
-        for i in range(len(ems_list)):
-            ems = ems_list[i]
-            new_ems = self.EMS_list(ems, box)
-            
-            if len(new_ems) != 0 or box.is_equal_to_ems(ems):
-                ind_to_remove.append(i)
-                for ne in new_ems:
-                    new_ems_list.append(ne)
+        new_ems_store = EMSStore(np.concatenate([ems_store.spaces[~to_remove], new_spaces]))
+        filtered_ems_store = self.filter_ems_list(new_ems_store)
+        PROFILER.observe("ga.ems_list_size", len(filtered_ems_store))
 
-        if len(ind_to_remove) != 0:
-            new_ems_list = [new_ems_list[k] for k in range(len(new_ems_list)) if k not in ind_to_remove]
-
-        filtered_ems_list = self.filter_ems_list(new_ems_list)
-
-        return filtered_ems_list
+        return filtered_ems_store
     
-    def filter_ems_list(self, ems_list):
+    def filter_ems_list(self, ems_store):
         """
-        Filter the list of EMS objects to remove redundant spaces.
+        Filter the store of EMS to remove redundant spaces, i.e. spaces lying inside another space.
 
         Parameters:
-        ems_list (list): The list of EMS objects.
+        ems_store (EMSStore): The store of EMS.
 
         Returns:
-        list: The filtered list of EMS objects.
+        EMSStore: The filtered store of EMS.
         """
-        sequence = list(range(len(ems_list)))
-        ind_remove = []
-
-        for i in sequence:
-            ems_i = ems_list[i]
-            for j in sequence:
-                if i == j:
-                    continue
-                if ems_i.is_inside(ems_list[j]):
-                    ind_remove.append(i)
-                    break
+        origins = ems_store.origins
+        ends = origins + ems_store.extents
 
-        if len(ind_remove) != 0:
-            ems_list = [ems_list[k] for k in range(len(ems_list)) if k not in ind_remove]
+        is_inside = (np.all(origins[:, None, :] >= origins[None, :, :], axis=2) &
+                     np.all(ends[:, None, :] <= ends[None, :, :], axis=2))
+        np.fill_diagonal(is_inside, False)
+        to_remove = np.any(is_inside, axis=1)
 
-        return ems_list
+        if np.any(to_remove):
+            return EMSStore(ems_store.spaces[~to_remove])
+        return ems_store
     
     def placement_selection(self, box, ems):
         """
@@ -477,13 +1200,44 @@ class GeneticAlgorithm(object):
         for l, h, w in rotations:
             if l <= ems.length and h <= ems.height and w <= ems.width:
                 margins = [ems.length - l, ems.height - h, ems.width - w]
-                possible_rotations.append(Box(l, h, w, origin=box.origin, weight=box.weight))
+                possible_rotations.append(Box(l, h, w, origin=box.origin, weight=box.weight, priority=box.priority, delay=box.delay,
+                                             index=box.index))
                 possible_margins.append(margins)
 
         best_ind = np.argmin([min(m) for m in possible_margins])
         return possible_rotations[best_ind]
     
-    def pack_boxes(self, boxes, containers, box_packing_sequence, container_loading_sequence):
+    def place_box(self, packing_state, container_ind, box_ind):
+        """
+        Place a box in the first EMS of a container, in priority order, that can hold it. Boxes that would
+        take the container over its weight capacity are rejected.
+
+        Parameters:
+        packing_state (PackingState): The state of the decode, updated with the placement.
+        container_ind (int): Index of the container.
+        box_ind (int): Index of the box to be placed.
+
+        Returns:
+        bool: True if the box was placed, False otherwise.
+        """
+        container, box = packing_state.containers[container_ind], packing_state.boxes[box_ind]
+        if not packing_state.can_carry(container_ind, box):
+            return False
+        container_ems = packing_state.ems[container_ind]
+        prioritized_ems = prioritize_ems(container_ems)
+        for ems_ind in np.flatnonzero(prioritized_ems.fits(box)):
+            ems = prioritized_ems[ems_ind]
+            new_box_with_placement = self.placement_selection(box, ems)
+            new_box_with_placement.origin = ems.origin.copy()
+            if container.if_box_outside(new_box_with_placement):
+                continue
+
+            packing_state.ems[container_ind] = self.update_ems(container_ems, new_box_with_placement)
+            packing_state.place(container_ind, box_ind, new_box_with_placement)
+            return True
+        return False
+
+    def pack_boxes(self, boxes, containers, box_packing_sequence, container_loading_sequence, packing_cost=None):
         """
         Perform the box packing process by placing boxes into containers according to the given sequences.
 
@@ -492,42 +1246,184 @@ class GeneticAlgorithm(object):
         containers (list): The list of container objects.
         box_packing_sequence (list): The sequence of boxes to be packed.
         container_loading_sequence (list): The sequence of containers to be loaded.
+        packing_cost (PackingCost, optional): Running cost of an empty packing, updated as boxes are packed.
 
         Returns:
         list: The packing solution (list of containers with packed boxes).
         """
-        n_containers, n_boxes = len(containers), len(boxes)
+        packing = self.decode_with_state(PackingState(containers, boxes), box_packing_sequence, container_loading_sequence,
+                                         packing_cost)
+        return packing.packing_solution(containers, boxes)
 
-        packing_solution = []
-        for c in containers:
-            packing_solution.append([deepcopy(c)])
+    def decode_with_state(self, packing_state, box_packing_sequence, container_loading_sequence, packing_cost=None):
+        """
+        Decode a chromosome from scratch into a packing, reusing a packing state.
 
-        placed_boxes = [False]*n_boxes
+        Parameters:
+        packing_state (PackingState): The state to decode into, reset first.
+        box_packing_sequence (list): The sequence of boxes to be packed.
+        container_loading_sequence (list): The sequence of containers to be loaded.
+        packing_cost (PackingCost, optional): Running cost of an empty packing, updated as boxes are packed.
+
+        Returns:
+        Packing: The packing.
+        """
+        n_containers, n_boxes = len(packing_state.containers), len(packing_state.boxes)
+        packing_state.reset()
+        placed = packing_state.placed
 
         for con_i in range(n_containers):
             container_ind = container_loading_sequence[con_i] -1 
             for box_i in range(n_boxes):
                 box_ind = box_packing_sequence[box_i] -1
-                if placed_boxes[box_ind]:
+                if placed[box_ind]:
                     continue
-                else:
-                    box = boxes[box_ind]
-                    con_EMS = packing_solution[container_ind][0].ems
-                    new_con_EMS = prioritize_ems(con_EMS)
-                    for ems in new_con_EMS:
-                        if ems.if_box_fits(box):
-                            new_box_with_placement = self.placement_selection(box, ems)
-                            new_box_with_placement.origin = ems.origin.copy()
-                            if packing_solution[container_ind][0].if_box_outside(new_box_with_placement):
-                                continue
-
-                            packing_solution[container_ind].append(new_box_with_placement)
-
-                            packing_solution[container_ind][0].ems = self.update_ems(packing_solution[container_ind][0].ems, new_box_with_placement)
-                            placed_boxes[box_ind] = True
-                            break
-        return packing_solution
-    
+                if self.place_box(packing_state, container_ind, box_ind) and packing_cost is not None:
+                    packing_cost.place(container_ind, packing_state.boxes[box_ind])
+        return packing_state.packing()
+
+    def chromosome_seed(self, bps, cls):
+        """
+        Derive the evaluation seed of a chromosome. The seed depends only on the chromosome and the base seed,
+        so it is the same whichever process evaluates the chromosome.
+
+        Parameters:
+        bps (list): The box packing sequence.
+        cls (list): The container loading sequence.
+
+        Returns:
+        int: The seed used while decoding the chromosome.
+        """
+        genes = np.asarray(list(bps) + list(cls), dtype=np.int64)
+        return zlib.crc32(genes.tobytes(), self.seed & 0xFFFFFFFF)
+
+    def decode_chromosome(self, bps, cls, packing_cost=None):
+        """
+        Decode a chromosome into a packing with the random generators seeded from the chromosome.
+        The caller's random state is restored afterwards, so serial and parallel evaluation consume the
+        global random streams identically.
+
+        Parameters:
+        bps (list): The box packing sequence.
+        cls (list): The container loading sequence.
+        packing_cost (PackingCost, optional): Running cost of an empty packing, updated as boxes are packed.
+
+        Returns:
+        Packing: The packing.
+        """
+        seed = self.chromosome_seed(bps, cls)
+        random_state, np_random_state = random.getstate(), np.random.get_state()
+        random.seed(seed)
+        np.random.seed(seed)
+        try:
+            if self.decoder is not None:
+                return self.decoder.decode(bps, cls, packing_cost)
+            return self.decode_with_state(self.packing_state, bps, cls, packing_cost)
+        finally:
+            random.setstate(random_state)
+            np.random.set_state(np_random_state)
+
+    def evaluate_chromosome(self, bps, cls):
+        """
+        Decode a chromosome and compute its fitness score. In "cost" mode the score is the running cost
+        tracked while decoding, so no pass over the packing is needed.
+
+        Parameters:
+        bps (list): The box packing sequence.
+        cls (list): The container loading sequence.
+
+        Returns:
+        tuple: The fitness score and the Packing of the chromosome.
+        """
+        if self.fitness_mode == "cost":
+            packing_cost = PackingCost(self.K, len(self.uld_dimensions), self.package_dimensions)
+            packing = self.decode_chromosome(bps, cls, packing_cost)
+            return packing_cost.total, packing
+        packing = self.decode_chromosome(bps, cls)
+        return packing.volume_fitness(self.uld_dimensions), packing
+
+    def cached_evaluation(self, bps, cls):
+        """
+        Return the fitness score and packing of a chromosome, decoding it only on a cache miss.
+
+        Parameters:
+        bps (list): The box packing sequence.
+        cls (list): The container loading sequence.
+
+        Returns:
+        tuple: The fitness score and the Packing of the chromosome.
+        """
+        key = self.fitness_cache.key(bps, cls)
+        entry = self.fitness_cache.get(key)
+        if entry is None:
+            entry = self.evaluate_chromosome(bps, cls)
+            self.fitness_cache.put(key, entry)
+        return entry
+
+    def create_evaluation_pool(self, population_size):
+        """
+        Create the process pool used for parallel fitness evaluation. Boxes and containers are shipped to
+        each worker once, through the pool initializer.
+
+        Parameters:
+        population_size (int): Number of chromosomes evaluated per generation.
+
+        Returns:
+        multiprocessing.pool.Pool or None: The pool, or None if evaluation is serial.
+        """
+        n_workers = min(self.n_workers, population_size)
+        if n_workers <= 1:
+            return None
+        self.log(f"Evaluating fitness with {n_workers} worker processes")
+        return multiprocessing.Pool(processes=n_workers, initializer=_init_evaluation_worker,
+                                    initargs=(self, PROFILER.enabled))
+
+    @profiled("ga.evaluate_population")
+    def evaluate_population(self, population, pool=None):
+        """
+        Compute the fitness score of every chromosome in the population, in parallel if a pool is given.
+        Chromosomes found in the fitness cache, and repeated chromosomes within the population, are decoded
+        only once. Both paths return bit-identical scores.
+
+        Parameters:
+        population (list): List of chromosomes.
+        pool (multiprocessing.pool.Pool, optional): Pool created by create_evaluation_pool.
+
+        Returns:
+        list: The fitness scores, in population order.
+        """
+        fitness_scores = [None] * len(population)
+        pending = {}
+        for i, chrom in enumerate(population):
+            key = self.fitness_cache.key(chrom.bps(), chrom.cls())
+            if key in pending:
+                pending[key].append(i)
+                continue
+            entry = self.fitness_cache.get(key)
+            if entry is None:
+                pending[key] = [i]
+            else:
+                fitness_scores[i] = entry[0]
+
+        chromosome_sequences = list(pending)
+        PROFILER.count("ga.evaluations", len(chromosome_sequences))
+        PROFILER.count("ga.fitness_cache_hits", len(population) - sum(len(indices) for indices in pending.values()))
+        PROFILER.count("ga.duplicate_chromosomes", sum(len(indices) - 1 for indices in pending.values()))
+        if pool is None:
+            results = [self.evaluate_chromosome(bps, cls) for bps, cls in chromosome_sequences]
+        else:
+            chunksize = max(1, len(chromosome_sequences) // (4 * self.n_workers))
+            results = []
+            for entry, records in pool.map(_evaluate_in_worker, chromosome_sequences, chunksize=chunksize):
+                if records is not None:
+                    PROFILER.merge(records)
+                results.append(entry)
+
+        for key, entry in zip(chromosome_sequences, results):
+            self.fitness_cache.put(key, entry)
+            for i in pending[key]:
+                fitness_scores[i] = entry[0]
+        return fitness_scores
 
     def create_chromosome(self, n_boxes, n_containers):
         """
@@ -697,18 +1593,8 @@ class GeneticAlgorithm(object):
         cut_box_i, cut_box_j = sorted(random.sample(range(n_boxes), 2))
         cut_con_i, cut_con_j = sorted(random.sample(range(n_containers), 2))
 
-        child_BPS = [bps1[x] if cut_box_i < x <= cut_box_j else 0 for x in range(n_boxes)]
-        child_CLS = [cls1[x] if cut_con_i < x <= cut_con_j else 0 for x in range(n_containers)]
-
-        def fill_missing(child, parent2, cut_i, cut_j, n):
-            missing = [g for g in parent2 if g not in set(child) - {0}]
-            fill_positions = list(range(cut_j + 1, n)) + list(range(cut_i + 1))
-            for pos in fill_positions:
-                if child[pos] == 0:
-                    child[pos] = missing.pop(0)
-
-        fill_missing(child_BPS, bps2, cut_box_i, cut_box_j, n_boxes)
-        fill_missing(child_CLS, cls2, cut_con_i, cut_con_j, n_containers)
+        child_BPS = order_crossover(bps1, bps2, cut_box_i, cut_box_j)
+        child_CLS = order_crossover(cls1, cls2, cut_con_i, cut_con_j)
 
         return Chromosome(child_BPS, child_CLS)
 
@@ -725,97 +1611,129 @@ class GeneticAlgorithm(object):
         """
         new_population = []
 
-        while len(mating_pool) > 1:
-            parent1, parent2 = random.sample(mating_pool, 2)
-            mating_pool.remove(parent1)
-            mating_pool.remove(parent2)
+        # Pairing consecutive chromosomes of a shuffled pool draws the same pairs as repeatedly sampling two
+        # chromosomes and removing them from the pool, without the quadratic removals.
+        order = list(range(len(mating_pool)))
+        random.shuffle(order)
+        for k in range(0, len(order) - 1, 2):
+            parent1, parent2 = mating_pool[order[k]], mating_pool[order[k + 1]]
 
             if random.random() < probability:
                 new_population.extend([self.crossover(parent1, parent2), self.crossover(parent2, parent1)])
             else:
                 new_population.extend([parent1, parent2])
 
-        if mating_pool:
-            new_population.append(mating_pool.pop())
+        if len(order) % 2:
+            new_population.append(mating_pool[order[-1]])
 
         return new_population
 
-    def perform_box_packing(self, n_iter, population_size, elitism_size, crossover_prob, mutation_prob):
+    def perform_box_packing(self, n_iter, population_size, elitism_size, crossover_prob, mutation_prob, deadline=None):
         """
         Executes the genetic algorithm for optimizing box packing into containers.
 
         Args:
             n_iter (int): Number of iterations to run the genetic algorithm.
             population_size (int): Size of the population to maintain in each generation.
-            elitism_size (int): Number of top-performing chromosomes to retain for elitism.
+            elitism_size (int): Number of top-performing chromosomes to retain for elitism. At most
+                population_size - 2 are retained, so that every generation breeds at least two new chromosomes.
             crossover_prob (float): Probability of performing crossover during reproduction.
             mutation_prob (float): Probability of mutating a chromosome.
+            deadline (float, optional): `time.monotonic()` value after which no new generation is started.
+                The generation being evaluated when it passes is still completed. Default is None (no deadline).
 
         Returns:
             list: A representation of the best solution for packing boxes into containers.
         """
         containers = self.uld_dimensions
         boxes = self.package_dimensions
+        elitism_size = min(elitism_size, max(population_size - 2, 0))
 
         # Initialize the population
         population = self.initialize_population(population_size, len(containers), boxes)
         elitism_chromosomes, elitism_fitness = [], []
+        pool = self.create_evaluation_pool(len(population))
+
+        try:
+            for _ in (range(n_iter) if n_iter is not None else itertools.count()):
+                self.log(f"Iteration {_} of {n_iter} in Genetic Algorithm")
+
+                # Evaluate fitness of each chromosome
+                fitness_scores = self.evaluate_population(population, pool)
+
+                # Include previous elitism chromosomes
+                population += elitism_chromosomes
+                fitness_scores += elitism_fitness
+
+                # Select elitism chromosomes
+                top_indices = self.elitism(fitness_scores, elitism_size)
+                elitism_chromosomes = [population[i] for i in top_indices]
+                elitism_fitness = [fitness_scores[i] for i in top_indices]
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.log(f"Deadline reached after {_ + 1} iterations of Genetic Algorithm")
+                    break
 
-        for _ in range(n_iter):
-            self.log(f"Iteration {_} of {n_iter} in Genetic Algorithm")
-            
-            # Evaluate fitness of each chromosome
-            box_packings = [self.pack_boxes(boxes, containers, chrom.bps(), chrom.cls()) for chrom in population]
-            fitness_scores = [self.fitness_score(box_packing) for box_packing in box_packings]
-
-            # Include previous elitism chromosomes
-            population += elitism_chromosomes
-            fitness_scores += elitism_fitness
-
-            # Select elitism chromosomes
-            top_indices = self.elitism(fitness_scores, elitism_size)
-            elitism_chromosomes = [population[i] for i in top_indices]
-            elitism_fitness = [fitness_scores[i] for i in top_indices]
-
-            if _ < n_iter - 1:
-                # Remove elitism chromosomes for next generation
-                remaining_indices = [i for i in range(len(population)) if i not in top_indices]
-                population = [population[i] for i in remaining_indices]
-                fitness_scores = [fitness_scores[i] for i in remaining_indices]
-
-                # Generate new population through selection, crossover, and mutation
-                mating_pool = self.selection(population, fitness_scores)
-                crossovered_chromosomes = self.perform_crossover(mating_pool, crossover_prob)
-                population = self.perform_mutation(crossovered_chromosomes, mutation_prob)
+                if n_iter is None or _ < n_iter - 1:
+                    # Remove elitism chromosomes for next generation
+                    remaining_indices = [i for i in range(len(population)) if i not in top_indices]
+                    if len(remaining_indices) < 2:
+                        # Nothing left to breed: further generations would only re-evaluate the elites
+                        self.log(f"Population of {len(population)} too small to breed, stopping after {_ + 1} iterations")
+                        break
+                    population = [population[i] for i in remaining_indices]
+                    fitness_scores = [fitness_scores[i] for i in remaining_indices]
+
+                    # Generate new population through selection, crossover, and mutation
+                    mating_pool = self.selection(population, fitness_scores)
+                    crossovered_chromosomes = self.perform_crossover(mating_pool, crossover_prob)
+                    population = self.perform_mutation(crossovered_chromosomes, mutation_prob)
+        except BaseException:
+            # Do not wait on the workers when interrupted
+            if pool is not None:
+                pool.terminate()
+                pool = None
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
         # Identify and return the best solution
         best_index = np.argmin(fitness_scores)
-        best_solution = self.pack_boxes(boxes, containers, population[best_index].bps(), population[best_index].cls())
+        _, best_packing = self.cached_evaluation(population[best_index].bps(), population[best_index].cls())
+        best_solution = best_packing.packing_solution(self.uld_dimensions, self.package_dimensions)
+        self.log(f"Fitness cache: {self.fitness_cache.hits} hits, {self.fitness_cache.misses} misses")
         return best_solution
 
-    def run_genetic_algorithm(self, n_iter=1, population_size=2, elitism_size=5, crossover_prob=0.5, mutation_prob=0.5):
+    @profiled("ga.run_genetic_algorithm")
+    def run_genetic_algorithm(self, n_iter=1, population_size=2, elitism_size=5, crossover_prob=0.5, mutation_prob=0.5, deadline=None):
         """
         Runs the complete genetic algorithm for box packing optimization.
 
         Args:
-            n_iter (int): Number of iterations for the genetic algorithm.
+            n_iter (int): Number of iterations for the genetic algorithm. None runs until `deadline`.
             population_size (int): Number of chromosomes in the population.
             elitism_size (int): Number of top chromosomes to retain for elitism.
             crossover_prob (float): Probability of crossover in the mating pool.
             mutation_prob (float): Probability of mutation for each chromosome.
+            deadline (float, optional): `time.monotonic()` value after which no new generation is started.
+                Default is None (no deadline).
 
         Returns:
             PackageMatcher: An object that matches packages to containers based on the optimal packing solution.
         """
-        packing_solution = self.perform_box_packing(n_iter, population_size, elitism_size, crossover_prob, mutation_prob)
+        if n_iter is None and deadline is None:
+            raise ValueError("n_iter can only be None when a deadline is given")
+        packing_solution = self.perform_box_packing(n_iter, population_size, elitism_size, crossover_prob, mutation_prob, deadline)
         self.log("Genetic Algorithm completed")
         self.log("Processing Best Found Solution into a ULD-Package Matching")
 
         # Generate a package-to-container matching solution
         package_matcher = PackageMatcher(
             packing_solution=packing_solution,
-            uld_ids=self.uld_dimensions_dict,
-            package_ids=self.package_dimensions_dict
+            uld_ids=self.uld_ids,
+            package_ids=self.package_ids
         )
 
         return package_matcher
@@ -1,9 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-from mpl_toolkits.mplot3d import Axes3D
 from collections import namedtuple
-import itertools
 
 
 def plot_3d_objects(objects):
@@ -16,6 +12,10 @@ def plot_3d_objects(objects):
     Returns:
         None: Displays a 3D plot of the objects.
     """
+    # Imported here so that the solver does not load matplotlib unless something is plotted
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
     
@@ -78,12 +78,13 @@ def plot(packing_solution):
 
 class PackageMatcher:
     """
-    Matches packages to ULDs based on their dimensions and packing solution, storing the associations.
+    Matches packages to ULDs based on the packing solution, storing the associations. Every packed box and
+    container carries its index in the genetic algorithm, so each one is mapped back with a direct lookup.
 
     Args:
         packing_solution (list): A list of containers, where each container is a list of objects (packages).
-        uld_ids (dict): A dictionary where the keys are ULD IDs and values are the ULD dimensions.
-        package_ids (dict): A dictionary where the keys are package IDs and values are the package dimensions.
+        uld_ids (list): The ULD IDs, in the order of the containers of the genetic algorithm.
+        package_ids (list): The package IDs, in the order of the boxes of the genetic algorithm.
     
     Returns:
         None: Initializes the package matching by associating packages with ULDs.
@@ -91,41 +92,21 @@ class PackageMatcher:
     def __init__(self, packing_solution, uld_ids, package_ids):        
         self.packing_solution = packing_solution
         self.package_association = {}
-        
-        reverse_uld_ids = {}
-        for k, dims in uld_ids.items():
-            reverse_uld_ids.setdefault(dims, []).append(k)
-        reverse_package_ids = {}
-        for k, dims in package_ids.items():
-            for perm in set(itertools.permutations(dims)):
-                reverse_package_ids.setdefault(perm, []).append((k, perm))
-        
-        marked_ulds, marked_packages = set(), set()
+        uld_ids, package_ids = list(uld_ids), list(package_ids)
 
         for container in packing_solution:
             if len(container) > 1:
-                container_dims = (container[0].length, container[0].width, container[0].height)
-                uld_id = next((uid for uid in reverse_uld_ids.get(container_dims, []) if uid not in marked_ulds), None)
-                if uld_id is None:
-                    raise Exception(f"No ULD found for container dimensions: {container_dims}")
-                marked_ulds.add(uld_id)
+                uld_id = uld_ids[container[0].index]
 
                 for package in container[1:]:
-                    package_dims = (package.length, package.width, package.height)
-                    possible_ids = [
-                        pkg for dims in itertools.permutations(package_dims) 
-                        for pkg in reverse_package_ids.get(dims, [])
-                    ]
-                    package_data = next((pkg for pkg in possible_ids if pkg[0] not in marked_packages), None)
-                    if package_data is None:
-                        raise Exception(f"No package found for dimensions: {package_dims}")
-                    
-                    package_id, orientation = package_data
-                    marked_packages.add(package_data)
+                    package_id = package_ids[package.index]
+                    if package_id in self.package_association:
+                        raise Exception(f"Package {package_id} is packed more than once")
+                    origin = package.origin.tolist()
                     self.package_association[package_id] = (
                         uld_id,
-                        (package.origin.tolist()[0], package.origin.tolist()[2], package.origin.tolist()[1]),
-                        orientation
+                        (origin[0], origin[2], origin[1]),
+                        (package.length, package.width, package.height)
                     )
 
     def get_parent_uld(self, package_id):
@@ -1,49 +1,95 @@
-from package import Package
+import os
+import numpy as np
+from itertools import islice
+from package import PackageTable, LazyPackages, PACKAGE_FIELDS
 from uld import ULD
 
-def parse_input(file):
+# Number of package lines parsed at once
+PACKAGE_CHUNK_SIZE = 65536
+
+def parse_package_chunk(lines):
+    """
+    Parses a chunk of package lines in bulk into columnar arrays.
+
+    Args:
+        lines (list[str]): Package lines, `id,length,width,height,weight,Priority|Economy,delay`.
+
+    Returns:
+        tuple: The package IDs (list[str]) and a dict of NumPy arrays of the `length`, `width`, `height`,
+            `weight`, `priority` and `delay` fields.
+    """
+    package_ids = [line.split(",", 1)[0] for line in lines]
+    priorities = np.array([line.rsplit(",", 2)[1].strip() == "Priority" for line in lines], dtype=np.int8)
+    numeric = np.loadtxt(lines, delimiter=",", usecols=(1, 2, 3, 4, 6), dtype=np.int64, ndmin=2)
+    columns = {
+        "length": numeric[:, 0],
+        "width": numeric[:, 1],
+        "height": numeric[:, 2],
+        "weight": numeric[:, 3],
+        "priority": priorities,
+        "delay": numeric[:, 4],
+    }
+    return package_ids, columns
+
+def parse_input(file, chunk_size=PACKAGE_CHUNK_SIZE):
     """
     Parses the input file to extract ULD and package data along with the optimization parameter K.
+    The input is streamed: package lines are read and parsed in chunks into columnar arrays, and
+    Package objects are only created when accessed.
 
     Args:
-        file (str): Path to the input file.
+        file (str or file object): Path to the input file, or an open text stream (e.g. `sys.stdin`),
+            which is read from its current position and left open.
+        chunk_size (int, optional): Number of package lines parsed at once. Default is PACKAGE_CHUNK_SIZE.
 
     Returns:
         tuple: A tuple containing:
             - ulds (dict): A dictionary mapping ULD IDs to ULD objects.
-            - packages (dict): A dictionary mapping package IDs to Package objects.
+            - packages (LazyPackages): A dictionary mapping package IDs to Package objects.
             - K (int): Optimization parameter indicating the number of iterations or priority level.
     """
-    with open(file, 'r') as file:
-        lines = file.readlines()
-    
-    uld_count = int(lines[0])  # Number of ULDs
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'r') as stream:
+            return parse_input(stream, chunk_size)
+    stream = file
+
+    uld_count = int(next(stream))  # Number of ULDs
     ulds = {}
-    line_index = 1
-    for _ in range(uld_count):
-        uld_data = lines[line_index].split(",")
+    for uld_line in islice(stream, uld_count):
+        uld_data = uld_line.split(",")
         uld_id = uld_data[0]
         length = uld_data[1]
         width = uld_data[2]
         height = uld_data[3]
         weight_capacity = uld_data[4]
         ulds[uld_id] = ULD(str(uld_id), int(length), int(width), int(height), int(weight_capacity))
-        line_index += 1
 
-    package_count = int(lines[line_index])  # Number of packages
-    packages = {}
-    line_index += 1
-    for _ in range(package_count):
-        package_data = lines[line_index].split(",")
-        package_id, length, width, height, weight, priority, delay = package_data
-        priority_string = priority.strip()
-        priority = 1 if priority_string == 'Priority' else 0
-        weight = int(weight)
-        delay = int(delay)
-        packages[package_id] = Package(str(package_id), int(length), int(width), int(height), weight, priority, delay)
-        line_index += 1
+    package_count = int(next(stream))  # Number of packages
+    package_ids, column_chunks = [], []
+    remaining = package_count
+    while remaining > 0:
+        lines = list(islice(stream, min(chunk_size, remaining)))
+        if not lines:
+            raise ValueError(f"Expected {package_count} packages, found {package_count - remaining}")
+        chunk_ids, chunk_columns = parse_package_chunk(lines)
+        package_ids += chunk_ids
+        column_chunks.append(chunk_columns)
+        remaining -= len(lines)
+    columns = {
+        field: np.concatenate([chunk[field] for chunk in column_chunks]) if column_chunks else np.zeros(0, dtype=np.int64)
+        for field in PACKAGE_FIELDS
+    }
+    # A repeated package ID keeps its first position and its last line, as assigning into a dict would
+    last_rows = {}
+    for row, package_id in enumerate(package_ids):
+        last_rows[package_id] = row
+    if len(last_rows) != len(package_ids):
+        rows = np.fromiter(last_rows.values(), dtype=np.intp, count=len(last_rows))
+        package_ids = list(last_rows)
+        columns = {field: column[rows] for field, column in columns.items()}
+    packages = LazyPackages(PackageTable(package_ids, columns))
 
-    K = int(lines[line_index])  # Optimization parameter
+    K = int(next(stream))  # Optimization parameter
 
     return ulds, packages, K
 
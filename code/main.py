@@ -1,79 +1,191 @@
-from visualizer import visualize
 import random
-import matplotlib
 from io_utils import parse_input
 from ocm import OptimalCargoManagement
-from validator import SolutionValidator 
+from validator import SolutionValidator, IncrementalValidator
+from profiling import PROFILER
 import numpy as np
+import argparse
+import atexit
+import itertools
+import multiprocessing
+import signal
+import time
 import sys
+import os
+
+# Fractions of the time budget at which each phase has to stop. The GA search gets the first 30%,
+# its ad-hoc additions the next 10%, the greedy passes run until 90% and the rest is kept for the
+# final validation and the output.
+GA_SEARCH_BUDGET = 0.3
+GA_ADHOC_BUDGET = 0.4
+GREEDY_BUDGET = 0.9
+GA_BUDGET_POPULATION_SIZE = 16
+
+
+def parse_arguments():
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The input file, output file, verbosity, optional time budget, GA fitness mode and
+            greedy engine, and whether to profile and visualize the run.
+    """
+    parser = argparse.ArgumentParser(description="Optimal Cargo Management - FedEx")
+    parser.add_argument("input", help="path to the input file, or - to read it from stdin")
+    parser.add_argument("output", help="path to the output file")
+    parser.add_argument("verbose", help="verbosity level, 0 or 1")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="wall-clock budget in seconds; the best valid solution found in time is written")
+    parser.add_argument("--ga-fitness", choices=["volume", "cost"], default="volume",
+                        help="GA fitness: unused ULD volume, or the cost of the packing")
+    parser.add_argument("--greedy-engine", choices=sorted(OptimalCargoManagement.GREEDY_ENGINES), default="rows",
+                        help="greedy packing engine: row by row and plane by plane, or a skyline per plane")
+    parser.add_argument("--profile", action="store_true",
+                        help="write the time of every phase and the solver counters to <output>.profile.json")
+    parser.add_argument("--visualize", action="store_true",
+                        help="plot every ULD of the solution to a PNG, in a background process")
+    return parser.parse_args()
+
+def raise_keyboard_interrupt(signum, frame):
+    """
+    Signal handler turning SIGTERM into a KeyboardInterrupt, so that the incumbent is still written.
+    """
+    raise KeyboardInterrupt
+
+def visualize_solution(input_file, output_file):
+    """
+    Plots every ULD of the solution written to the output file. The visualizer, and matplotlib with it, is only
+    imported here, so that runs without visualization do not pay for it.
+    """
+    from visualizer import visualize
+    visualize(input_file=input_file, output_file=output_file, show=False)
+
+def select_solution(ga_solution, greedy_solutions):
+    """
+    Selects the cheapest of the valid GA and greedy solutions found so far.
+
+    Args:
+        ga_solution (tuple): The cost and snapshot of the valid GA solution, or None.
+        greedy_solutions (list): The cost and snapshot of the valid greedy solutions.
+
+    Returns:
+        tuple: The cost and snapshot of the cheapest solution, or None if there is none.
+    """
+    min_greedy_solution = min(greedy_solutions, key=lambda solution: solution[0]) if greedy_solutions else None
+    if ga_solution is not None and (min_greedy_solution is None or ga_solution[0] < min_greedy_solution[0]):
+        return ga_solution
+    return min_greedy_solution
 
 if __name__ == "__main__":
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    verbose = True if sys.argv[3] == "1" else False
+    args = parse_arguments()
+    input_file = args.input
+    output_file = args.output
+    verbose = True if args.verbose == "1" else False
+    time_budget = args.time_budget
     GREEDY_ITERATIONS = 2
-    
+    GA_WORKERS = os.cpu_count() or 1
+
+    start_time = time.monotonic()
+    def budget_deadline(fraction):
+        return None if time_budget is None else start_time + fraction * time_budget
+    signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
+    if args.profile:
+        # Written at exit, so that interrupted and failed runs are profiled too
+        PROFILER.enable()
+        atexit.register(PROFILER.write_json, output_file + ".profile.json")
+
     costs = []
-    matplotlib.pyplot.close("all")
-    
+
     random_seed = 28072
     random.seed(random_seed)
     np.random.seed(random_seed)
-    
-    
+
+
     runs_ocm_cost = {}
-    
-    ulds, packages, K = parse_input(input_file)
-    ga_ocm = OptimalCargoManagement(ulds, packages, K, verbose)
-    ga_ocm.create_package_ordering()
-    ga_ocm.run_genetic_algorithm()
-    ga_ocm.adhoc_additions()
-    
-    ga_sv = SolutionValidator(ga_ocm, verbose)
-    ga_sv.validate()
-    if ga_sv.is_valid():
-        print("GA solution is valid.")
-        print("GA solution cost: ", ga_ocm.cost())  
-    else:
-        print("GA solution is invalid.")
-        ga_ocm = None   
-        
-    greedy_ocm_list = []
-    for i in range(GREEDY_ITERATIONS):
-        greedy_ulds, greedy_packages, K = parse_input(input_file)
-        greedy_ocm = OptimalCargoManagement(greedy_ulds, greedy_packages, K, verbose)
-        greedy_priority_ordering, greedy_economy_ordering = greedy_ocm.create_package_ordering()
-        greedy_ocm.reorient_packages()
-        
-        for top_k in range(min(greedy_ocm.MIN_PRIORITY_ULDS, len(greedy_ocm.ulds)//2) + 1, len(greedy_ocm.ulds)+1):
-            largest_ulds_by_volume = sorted(
-                        greedy_ocm.ulds.keys(),
-                        key=lambda x: ((greedy_ocm.ulds[x].length * greedy_ocm.ulds[x].width * greedy_ocm.ulds[x].height),x),
-                        reverse=True
-                    )[:top_k]
-                
-            greedy_ocm.fit_greedy(optional_ordering=greedy_priority_ordering, selected_ulds=largest_ulds_by_volume)
-            unused_ulds = greedy_ocm.unused_uld_ids()
-            greedy_ocm.fit_greedy(optional_ordering=greedy_economy_ordering, selected_ulds=unused_ulds)
-            greedy_ocm.adhoc_additions()
-            sv = SolutionValidator(greedy_ocm, verbose)
-            sv.validate()
-            if sv.is_valid():
-                print(f"Greedy solution {i} is valid.")
-                greedy_ocm_list.append(greedy_ocm)
+
+    # The manifest is parsed once: every solution below starts from a snapshot of the parsed state, and the
+    # valid solutions are kept as snapshots
+    with PROFILER.phase("parse_input"):
+        ulds, packages, K = parse_input(sys.stdin if input_file == "-" else input_file)
+    ocm = OptimalCargoManagement(ulds, packages, K, verbose)
+    validator = IncrementalValidator(ocm, verbose)
+    parsed_state = ocm.snapshot()
+
+    ga_solution = None
+    greedy_solutions = []
+    interrupted = False
+    try:
+        ocm.create_package_ordering()
+        ocm.deadline = budget_deadline(GA_SEARCH_BUDGET)
+        if time_budget is None:
+            ocm.run_genetic_algorithm(n_workers=GA_WORKERS, fitness_mode=args.ga_fitness)
+        else:
+            ocm.run_genetic_algorithm(n_workers=GA_WORKERS, n_iter=None, population_size=GA_BUDGET_POPULATION_SIZE,
+                                      fitness_mode=args.ga_fitness)
+        ocm.deadline = budget_deadline(GA_ADHOC_BUDGET)
+        ocm.adhoc_additions()
+
+        if validator.is_valid():
+            print("GA solution is valid.")
+            print("GA solution cost: ", ocm.cost())
+            ga_solution = (ocm.cost(), ocm.snapshot())
+        else:
+            print("GA solution is invalid.")
+
+        greedy_deadline = budget_deadline(GREEDY_BUDGET)
+        ocm.deadline = greedy_deadline
+        for i in (range(GREEDY_ITERATIONS) if time_budget is None else itertools.count()):
+            if greedy_deadline is not None and time.monotonic() >= greedy_deadline:
                 break
-            
-    min_greedy_cost, min_greedy_cost_arg = min([ocm.cost() for ocm in greedy_ocm_list]), np.argmin([ocm.cost() for ocm in greedy_ocm_list])
-    min_greedy_ocm = greedy_ocm_list[min_greedy_cost_arg]
-
-    final_ocm_solution = ga_ocm if ga_ocm.cost() < min_greedy_cost else min_greedy_ocm
-    final_sv = SolutionValidator(final_ocm_solution, verbose)
-    final_sv.validate()
-    if final_sv.is_valid():
-        print("Final solution is valid.")
-    else:
-        print("Final solution is invalid.")
-        final_ocm_solution = None
-    final_ocm_solution.file_output_ocm(output_file)
-    print("Minimum Greedy Solution Cost: ", min_greedy_cost)
-    visualize(input_file=input_file, output_file=output_file, show = False)
\ No newline at end of file
+            ocm.restore(parsed_state)
+            greedy_priority_ordering, greedy_economy_ordering = ocm.create_package_ordering()
+            ocm.reorient_packages()
+            reoriented_state = ocm.snapshot()
+
+            for top_k in range(min(ocm.MIN_PRIORITY_ULDS, len(ocm.ulds)//2) + 1, len(ocm.ulds)+1):
+                if ocm.deadline_reached():
+                    break
+                # Every top_k is tried from the reoriented packages, not from the previous failed attempt
+                ocm.restore(reoriented_state)
+                largest_ulds_by_volume = sorted(
+                            ocm.ulds.keys(),
+                            key=lambda x: ((ocm.ulds[x].length * ocm.ulds[x].width * ocm.ulds[x].height),x),
+                            reverse=True
+                        )[:top_k]
+
+                ocm.fit_greedy(optional_ordering=greedy_priority_ordering, selected_ulds=largest_ulds_by_volume,
+                               engine=args.greedy_engine)
+                unused_ulds = ocm.unused_uld_ids()
+                ocm.fit_greedy(optional_ordering=greedy_economy_ordering, selected_ulds=unused_ulds, engine=args.greedy_engine)
+                ocm.adhoc_additions()
+                if validator.is_valid():
+                    print(f"Greedy solution {i} is valid.")
+                    greedy_solutions.append((ocm.cost(), ocm.snapshot()))
+                    break
+    except KeyboardInterrupt:
+        interrupted = True
+        print("Interrupted, writing the best valid solution found so far.")
+
+    final_solution = select_solution(ga_solution, greedy_solutions)
+    if final_solution is None:
+        print("No valid solution found.")
+        sys.exit(1)
+    ocm.restore(final_solution[1])
+    if not interrupted:
+        final_sv = SolutionValidator(ocm, verbose)
+        final_sv.validate()
+        if final_sv.is_valid():
+            print("Final solution is valid.")
+        else:
+            print("Final solution is invalid.")
+            sys.exit(1)
+    ocm.file_output_ocm(output_file)
+    if greedy_solutions:
+        print("Minimum Greedy Solution Cost: ", min(cost for cost, _ in greedy_solutions))
+    if args.visualize and not interrupted:
+        if input_file == "-":
+            print("The input was read from stdin, the solution is not visualized.")
+        else:
+            # The output file is complete at this point; the plots are drawn while the process exits
+            print("Visualizing the solution in the background.")
+            multiprocessing.Process(target=visualize_solution, args=(input_file, output_file)).start()
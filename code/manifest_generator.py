@@ -0,0 +1,104 @@
+import sys
+import math
+import numpy as np
+
+# ULD types of the challenge manifest: (length, width, height, weight capacity), with their share of the fleet
+DEFAULT_ULD_TYPES = [
+    ((224, 318, 162, 2500), 1 / 3),
+    ((244, 318, 244, 2800), 1 / 3),
+    ((244, 318, 285, 3500), 1 / 3),
+]
+# Packages per ULD in the challenge manifest, used to size the fleet
+PACKAGES_PER_ULD = 400 / 6
+
+
+def sample_dimensions(rng, n, dimension_range, distribution):
+    """
+    Samples package dimensions.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        n (int): Number of packages.
+        dimension_range (tuple): Smallest and largest dimension.
+        distribution (str): "uniform", or "normal" centred on the middle of the range with a sixth of the range
+            as standard deviation, clipped to the range.
+
+    Returns:
+        np.ndarray: (n, 3) array of dimensions.
+    """
+    low, high = dimension_range
+    if distribution == "uniform":
+        return rng.integers(low, high + 1, size=(n, 3))
+    if distribution == "normal":
+        samples = rng.normal((low + high) / 2, (high - low) / 6, size=(n, 3))
+        return np.clip(np.rint(samples), low, high).astype(np.int64)
+    raise ValueError(f"Unknown dimension distribution {distribution!r}, expected 'uniform' or 'normal'")
+
+def generate_manifest(n_packages, seed=0, n_ulds=None, uld_types=None, priority_ratio=0.25,
+                      dimension_range=(40, 110), dimension_distribution="uniform", density_range=(0.07, 0.29),
+                      delay_range=(60, 176), K=5000):
+    """
+    Generates a random manifest in the format read by `io_utils.parse_input`. The defaults follow the
+    statistics of the challenge manifest: dimensions, weight per volume, delays, priority ratio and ULD mix.
+
+    Args:
+        n_packages (int): Number of packages.
+        seed (int, optional): Seed of the random generator; the same seed gives the same manifest. Default is 0.
+        n_ulds (int, optional): Number of ULDs. Default keeps the packages per ULD of the challenge manifest.
+        uld_types (list, optional): ((length, width, height, capacity), share) of every ULD type; the shares are
+            normalized. Default is DEFAULT_ULD_TYPES.
+        priority_ratio (float, optional): Probability of a package being a priority package. Default is 0.25.
+        dimension_range (tuple, optional): Smallest and largest package dimension. Default is (40, 110).
+        dimension_distribution (str, optional): "uniform" or "normal", see `sample_dimensions`. Default is
+            "uniform".
+        density_range (tuple, optional): Range of the weight per 1000 units of volume. Default is (0.07, 0.29).
+        delay_range (tuple, optional): Range of the delay cost of economy packages. Default is (60, 176).
+        K (int, optional): Cost of every ULD holding priority packages. Default is 5000.
+
+    Returns:
+        list[str]: The lines of the manifest.
+    """
+    rng = np.random.default_rng(seed)
+    uld_types = uld_types if uld_types is not None else DEFAULT_ULD_TYPES
+    if n_ulds is None:
+        n_ulds = max(1, math.ceil(n_packages / PACKAGES_PER_ULD))
+
+    shares = np.array([share for _, share in uld_types], dtype=float)
+    uld_type_indices = np.sort(rng.choice(len(uld_types), size=n_ulds, p=shares / shares.sum()))
+    lines = [str(n_ulds)]
+    for i, type_ind in enumerate(uld_type_indices.tolist()):
+        length, width, height, capacity = uld_types[type_ind][0]
+        lines.append(f"U{i + 1},{length},{width},{height},{capacity}")
+
+    dimensions = sample_dimensions(rng, n_packages, dimension_range, dimension_distribution)
+    densities = rng.uniform(*density_range, size=n_packages)
+    weights = np.maximum(1, np.rint(dimensions.prod(axis=1) * densities / 1000)).astype(np.int64)
+    priorities = rng.random(n_packages) < priority_ratio
+    delays = rng.integers(delay_range[0], delay_range[1] + 1, size=n_packages)
+
+    lines.append(str(n_packages))
+    for i, ((length, width, height), weight, priority, delay) in enumerate(
+            zip(dimensions.tolist(), weights.tolist(), priorities.tolist(), delays.tolist())):
+        kind, delay = ("Priority", -1) if priority else ("Economy", delay)
+        lines.append(f"P-{i + 1},{length},{width},{height},{weight},{kind},{delay}")
+    lines.append(str(K))
+    return lines
+
+def write_manifest(file_path, n_packages, **kwargs):
+    """
+    Generates a manifest with `generate_manifest` and writes it to a file.
+
+    Args:
+        file_path (str): Path to the output file.
+        n_packages (int): Number of packages.
+        **kwargs: Other arguments of `generate_manifest`.
+    """
+    with open(file_path, "w") as file:
+        file.write("\n".join(generate_manifest(n_packages, **kwargs)) + "\n")
+
+
+if __name__ == "__main__":
+    output_file = sys.argv[1]
+    n_packages = int(sys.argv[2])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    write_manifest(output_file, n_packages, seed=seed)
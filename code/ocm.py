@@ -1,6 +1,8 @@
+import time
 import random
-from package import crainic_sorting
+from package import crainic_sorting, LazyPackages
 from genetic import GeneticAlgorithm
+from profiling import profiled
 
 class OptimalCargoManagement(object):
     """
@@ -14,8 +16,12 @@ class OptimalCargoManagement(object):
         non_priority_ordering (list): Ordering of non-priority packages.
         priority_ordering (list): Ordering of priority packages.
         verbose (bool): Whether to enable verbose logging.
+        deadline (float): `time.monotonic()` value at which the running phase should stop, or None.
     """
 
+    # ULD method placing a package with each engine of `fit_greedy`
+    GREEDY_ENGINES = {"rows": "uld_fill_greedy", "skyline": "uld_fill_skyline"}
+
     def __init__(self, ulds, packages, K, verbose=False):
         """
         Initializes the OptimalCargoManagement instance.
@@ -35,6 +41,7 @@ class OptimalCargoManagement(object):
         self.verbose = verbose
         self.MIN_PRIORITY_ULDS = 3  
         self.MINIMUM_ECONOMY_PACKAGES = 150
+        self.deadline = None
 
     def log(self, message):
         """
@@ -46,6 +53,26 @@ class OptimalCargoManagement(object):
         if self.verbose:
             print(message)
 
+    def deadline_reached(self):
+        """
+        Checks whether the deadline of the running phase has passed.
+
+        Returns:
+            bool: True if a deadline is set and has passed, otherwise False.
+        """
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def time_left(self):
+        """
+        Returns the time left before the deadline of the running phase.
+
+        Returns:
+            float: Seconds left before the deadline (at least 0), or None if no deadline is set.
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
     def add_uld(self, uld):
         """
         Adds a new ULD to the system.
@@ -64,9 +91,49 @@ class OptimalCargoManagement(object):
         """
         self.packages[package.package_id] = package
 
+    @profiled("ocm.snapshot")
+    def snapshot(self):
+        """
+        Records the state of the solution: placements and orientations of the packages, and the packages, fill
+        cursors and occupied space of the ULDs. The package arrays are copied on write, so taking a snapshot
+        and restoring it are cheap compared to parsing the input again.
+
+        Returns:
+            dict: The state of the solution, to be passed to `restore`.
+
+        Raises:
+            ValueError: If the packages are not all held by the table of a LazyPackages, as returned by
+                `parse_input`.
+        """
+        if not (isinstance(self.packages, LazyPackages) and self.packages.table_backed):
+            raise ValueError("Snapshots need the packages returned by parse_input")
+        return {
+            "packages": self.packages.table.snapshot(),
+            "ulds": {uld_id: uld.snapshot() for uld_id, uld in self.ulds.items()},
+            "orderings": (self.package_ordering, self.priority_ordering, self.non_priority_ordering),
+        }
+
+    @profiled("ocm.restore")
+    def restore(self, snapshot):
+        """
+        Restores the solution to a state recorded by `snapshot`. The snapshot stays valid, and can be restored
+        again.
+
+        Args:
+            snapshot (dict): The state returned by `snapshot`.
+        """
+        self.packages.table.restore(snapshot["packages"])
+        # Clear the listeners of every ULD first, so that no placement is moved between two ULDs
+        for uld in self.ulds.values():
+            uld.notify_refresh()
+        for uld_id, uld_state in snapshot["ulds"].items():
+            self.ulds[uld_id].restore(uld_state)
+        self.package_ordering, self.priority_ordering, self.non_priority_ordering = snapshot["orderings"]
+
     def cost(self, only_priority=False):
         """
-        Calculates the total cost of the solution, including priority and economy costs.
+        Calculates the total cost of the solution, including priority and economy costs. Runs in O(1) on
+        parsed packages, whose table keeps running totals of the cost terms.
 
         Args:
             only_priority (bool, optional): If True, calculates only the priority cost. Default is False.
@@ -74,14 +141,18 @@ class OptimalCargoManagement(object):
         Returns:
             float: The total cost of the solution.
         """
-        priority_activated_ulds = set(
-            package.loaded for package in self.packages.values() if package.priority and package.loaded
-        )
-        priority_cost = len(priority_activated_ulds)
-
-        economy_cost = sum(
-            package.delay for package in self.packages.values() if not package.priority and package.loaded is None
-        )
+        cost_terms = self.packages.cost_terms() if isinstance(self.packages, LazyPackages) else None
+        if cost_terms is not None:
+            priority_cost, economy_cost = cost_terms
+        else:
+            priority_activated_ulds = set(
+                package.loaded for package in self.packages.values() if package.priority and package.loaded
+            )
+            priority_cost = len(priority_activated_ulds)
+
+            economy_cost = sum(
+                package.delay for package in self.packages.values() if not package.priority and package.loaded is None
+            )
 
         total_cost = priority_cost * self.K + economy_cost
         return priority_cost if only_priority else total_cost
@@ -93,21 +164,32 @@ class OptimalCargoManagement(object):
         Returns:
             int: Number of loaded packages.
         """
+        if isinstance(self.packages, LazyPackages) and self.packages.table_backed:
+            return self.packages.num_loaded()
         return sum(1 for package in self.packages.values() if package.loaded is not None)
 
-    def fit_greedy(self, optional_ordering=None, selected_ulds=None):
+    @profiled("ocm.fit_greedy")
+    def fit_greedy(self, optional_ordering=None, selected_ulds=None, engine="rows"):
         """
         Attempts to load packages into ULDs using a greedy algorithm.
 
         Args:
             optional_ordering (list, optional): Custom ordering of packages for loading. Default is None.
             selected_ulds (list, optional): Specific ULD IDs to use for loading. Default is None.
+            engine (str, optional): "rows" fills each ULD row by row and plane by plane (`ULD.uld_fill_greedy`),
+                "skyline" keeps the free surface of every plane (`ULD.uld_fill_skyline`). Default is "rows".
         """
+        if engine not in self.GREEDY_ENGINES:
+            raise ValueError(f"Unknown greedy engine {engine!r}, expected one of {sorted(self.GREEDY_ENGINES)}")
+        fill_method = self.GREEDY_ENGINES[engine]
         self.log(f"Fitting packages in {len(self.ulds)} ULDs")
         self.log(f"Optional ordering: {True if optional_ordering is not None else False}")
 
         package_order = optional_ordering if optional_ordering else self.package_ordering
         for order in package_order:
+            if self.deadline_reached():
+                self.log("Deadline reached, stopping greedy fitting")
+                break
             package_id = order[0]
             # ulds_to_use = selected_ulds if selected_ulds is not None else random.shuffle(list(self.ulds.keys()))
             # print(ulds_to_use, selected_ulds)
@@ -118,7 +200,7 @@ class OptimalCargoManagement(object):
                 random.shuffle(ulds_to_use)
             # print(list(self.ulds.keys()))
             for uld_id in ulds_to_use:
-                if self.ulds[uld_id].uld_fill_greedy(self.packages[package_id]):
+                if getattr(self.ulds[uld_id], fill_method)(self.packages[package_id]):
                     break
 
     def __repr__(self):
@@ -146,6 +228,7 @@ class OptimalCargoManagement(object):
         attributes = f"OptimalCargoManagement Attributes = {len(self.ulds)} ULDs, {len(self.packages)} Packages, K = {self.K}"
         return uld_string + package_string + attributes
 
+    @profiled("ocm.file_output_ocm")
     def file_output_ocm(self, filename):
         """
         Outputs the current solution to a file.
@@ -162,11 +245,12 @@ class OptimalCargoManagement(object):
 
             for package in self.packages.values():
                 if package.loaded:
-                    corners = package.corners
-                    file.write(f"{package.package_id},{package.loaded},{corners[0][0]},{corners[0][1]},{corners[0][2]},{corners[7][0]},{corners[7][1]},{corners[7][2]}\n")
+                    (x0, y0, z0), (x1, y1, z1) = package.reference_corner, package.far_corner
+                    file.write(f"{package.package_id},{package.loaded},{x0},{y0},{z0},{x1},{y1},{z1}\n")
                 else:
                     file.write(f"{package.package_id},NONE,-1,-1,-1,-1,-1,-1\n")
 
+    @profiled("ocm.create_package_ordering")
     def create_package_ordering(self):
         """
         Creates an optimized ordering of packages based on priority and dimensions.
@@ -185,6 +269,7 @@ class OptimalCargoManagement(object):
         return self.priority_ordering, self.non_priority_ordering
 
         
+    @profiled("ocm.reorient_packages")
     def reorient_packages(self):
         """
         Reorients packages based on their ordered Z-index orientations.
@@ -201,6 +286,7 @@ class OptimalCargoManagement(object):
             package_to_reorient = self.packages[package_id]
             package_to_reorient.reorient(order_z_against)
 
+    @profiled("ocm.adhoc_additions")
     def adhoc_additions(self, random_shuffle=False):
         """
         Attempts to load remaining unloaded packages into ULDs using an ad-hoc placement algorithm.
@@ -231,6 +317,9 @@ class OptimalCargoManagement(object):
         # Try loading the sorted packages into ULDs
         adhoc_loaded_packages_count = 0
         for package_id in sorted_unloaded_pkd_ids:
+            if self.deadline_reached():
+                self.log("Deadline reached, stopping Ad-Hoc Additions")
+                break
             package = self.packages[package_id]
             for uld in self.ulds.values():
                 if uld.fit_in_package(package):
@@ -251,13 +340,36 @@ class OptimalCargoManagement(object):
         unused_uld_ids = set(self.ulds.keys()) - used_ulds
         return unused_uld_ids
 
-    def run_genetic_algorithm(self):
+    def add_loaded_packages(self):
+        """
+        Adds every loaded package to its ULD, after the genetic algorithm has set their placements.
+        """
+        for package in self.packages.values():
+            if package.loaded:
+                self.ulds[package.loaded].add_package(package)
+
+    @profiled("ocm.run_genetic_algorithm")
+    def run_genetic_algorithm(self, n_workers=1, n_iter=1, population_size=2, fitness_mode="volume", after_priority=None):
         """
         Optimizes the placement of priority and non-priority packages using a genetic algorithm.
 
         The method first processes priority packages into specific ULDs and then handles
         non-priority packages into remaining ULDs, ensuring optimized placement.
 
+        Args:
+            n_workers (int, optional): Number of worker processes used for fitness evaluation.
+                Default is 1 (serial); None uses all available cores.
+            n_iter (int, optional): Number of generations of each genetic algorithm. None runs until the
+                deadline, which must then be set. Default is 1.
+            population_size (int, optional): Population size of each genetic algorithm. Default is 2.
+            fitness_mode (str, optional): "volume" scores packings by unused ULD volume, "cost" by the cost of
+                the packing (K per priority ULD plus the delay of unloaded economy packages). Default is "volume".
+            after_priority (callable, optional): Called with this object once the priority packages are placed,
+                before the non-priority genetic algorithm; it can raise to stop the run. Default is None.
+
+        If `deadline` is set, every attempt of the priority genetic algorithm gets half of the time left when it
+        starts and the non-priority one the rest; the non-priority one is skipped once the deadline has passed.
+
         Modifies:
             Updates the placement and orientation of both priority and non-priority packages 
             in `self.packages` and refreshes unused ULDs in `self.ulds`.
@@ -269,6 +381,9 @@ class OptimalCargoManagement(object):
             4. Update ULDs and packages with the optimized placement.
         """
         for top_k in range(min(self.MIN_PRIORITY_ULDS, len(self.ulds)//2), len(self.ulds)+1):
+            if self.deadline_reached():
+                self.log("Deadline reached, stopping priority packages processing")
+                break
             try:
                 largest_ulds_by_volume = sorted(
                     self.ulds.keys(),
@@ -279,17 +394,19 @@ class OptimalCargoManagement(object):
                 
                 # Process priority packages with genetic algorithm
                 containers_data = [
-                    [uld.length, uld.width, uld.height, uld.uld_id]
+                    [uld.length, uld.width, uld.height, uld.uld_id, uld.capacity]
                     for uld in self.ulds.values() if uld.uld_id in largest_ulds_by_volume
                 ]
                 
                 packages_data = [
-                    [package.length, package.width, package.height, package.package_id]
+                    [package.length, package.width, package.height, package.package_id, package.priority, package.delay, package.weight]
                     for package in self.packages.values() if package.priority
                 ]
                 
-                priority_ga_instance = GeneticAlgorithm(uld_dimensions=containers_data, package_dimensions=packages_data)
-                priority_ga_solution = priority_ga_instance.run_genetic_algorithm()
+                priority_deadline = None if self.deadline is None else time.monotonic() + self.time_left() / 2
+                priority_ga_instance = GeneticAlgorithm(uld_dimensions=containers_data, package_dimensions=packages_data, n_workers=n_workers,
+                                                        fitness_mode=fitness_mode, K=self.K)
+                priority_ga_solution = priority_ga_instance.run_genetic_algorithm(n_iter=n_iter, population_size=population_size, deadline=priority_deadline)
 
                 # Update placement of priority packages
                 for package in self.packages.values():
@@ -303,18 +420,26 @@ class OptimalCargoManagement(object):
                         
                 self.log(f"Priority Packages Processed with Top {top_k} ULDs By Volume: {largest_ulds_by_volume}")
                 break
-            except:
+            except Exception:
                 self.log(f"Error in processing priority packages with Top {top_k} By Volume")
                 self.log(f"Trying with Top {top_k+1} By Volume")
                 for uld_id in self.ulds.keys():
                     self.ulds[uld_id].refresh()
                 continue
 
+        if after_priority is not None:
+            after_priority(self)
+
         # Refresh unused ULDs
         unused_uld_ids = self.unused_uld_ids()
         for uld_id in unused_uld_ids:
             self.ulds[uld_id].refresh()
 
+        if self.deadline_reached():
+            self.log("Deadline reached, skipping non-priority packages processing")
+            self.add_loaded_packages()
+            return
+
         # Process non-priority packages
         non_priority_delay_dict = {pkg.package_id: pkg.delay for pkg in self.packages.values() if not pkg.priority}
         non_priority_volume_dict = {pkg.package_id: pkg.length * pkg.width * pkg.height for pkg in self.packages.values() if not pkg.priority}
@@ -327,15 +452,16 @@ class OptimalCargoManagement(object):
         random.shuffle(economy_pkg_ordering)
 
         eco_containers_data = [
-            [uld.length, uld.width, uld.height, uld_id]
+            [uld.length, uld.width, uld.height, uld_id, uld.capacity]
             for uld_id, uld in self.ulds.items() if uld_id in unused_uld_ids
         ]
         eco_packages_data = [
-            [pkg.length, pkg.width, pkg.height, pkg.package_id]
+            [pkg.length, pkg.width, pkg.height, pkg.package_id, pkg.priority, pkg.delay, pkg.weight]
             for pkg_id, pkg in self.packages.items() if pkg_id in economy_pkg_ordering
         ]
-        economy_ga_instance = GeneticAlgorithm(uld_dimensions=eco_containers_data, package_dimensions=eco_packages_data)
-        eco_ga_solution = economy_ga_instance.run_genetic_algorithm()
+        economy_ga_instance = GeneticAlgorithm(uld_dimensions=eco_containers_data, package_dimensions=eco_packages_data, n_workers=n_workers,
+                                               fitness_mode=fitness_mode, K=self.K)
+        eco_ga_solution = economy_ga_instance.run_genetic_algorithm(n_iter=n_iter, population_size=population_size, deadline=self.deadline)
 
         # Update placement of non-priority packages
         for package in self.packages.values():
@@ -349,10 +475,7 @@ class OptimalCargoManagement(object):
                 package.length, package.width, package.height = pkg_orientation
                 package.generate_corners(ref_corner)
 
-        # Update ULDs with loaded packages
-        for package in self.packages.values():
-            if package.loaded:
-                self.ulds[package.loaded].add_package(package)
+        self.add_loaded_packages()
 
                     
             
\ No newline at end of file
@@ -1,8 +1,242 @@
 import random
+import numpy as np
+from collections.abc import MutableMapping
+from functools import lru_cache
+from profiling import PROFILER
+
+PACKAGE_FIELDS = ("length", "width", "height", "weight", "priority", "delay")
+
+
+class PackageTable:
+    """
+    Columnar storage of packages: every field is a NumPy array with one row per package. Package objects are
+    views over one row, so bulk operations such as the cost can run vectorized over the whole table. The terms
+    of the cost are kept as running totals, updated whenever a package is loaded, unloaded, or changes priority
+    or delay, so that they can be queried in O(1).
+
+    Snapshots share the arrays with the table: an array is only copied by the first write after a snapshot
+    or a restore, so taking and restoring snapshots is cheap.
+
+    Attributes:
+        package_ids (list[str]): ID of the package of every row.
+        length, width, height, weight, delay (np.ndarray): The package fields.
+        priority (np.ndarray): Priority level of every package (1 for priority, 0 otherwise).
+        origin (np.ndarray): (n, 3) reference corner of every placed package.
+        placed (np.ndarray): Whether the corners of each package have been generated.
+        loaded (np.ndarray): Code of the ULD each package is loaded in, or -1 if it is not loaded.
+        uld_ids (list): ULD ID of every code, so that each ULD ID is stored once.
+        uld_codes (dict): Code of every ULD ID.
+        priority_uld_counts (dict): Number of loaded priority packages, keyed by the code of their ULD.
+        unloaded_economy_delay (int): Total delay of the economy packages that are not loaded.
+        n_loaded (int): Number of loaded packages.
+        shared (set): Names of the arrays shared with a snapshot, to be copied before they are written.
+    """
+    ARRAY_FIELDS = ("length", "width", "height", "weight", "priority", "delay", "origin", "placed", "loaded")
+
+    def __init__(self, package_ids, columns):
+        """
+        Initializes a PackageTable with no package placed nor loaded.
+
+        Args:
+            package_ids (list[str]): ID of every package.
+            columns (dict): Arrays (or sequences) of the `length`, `width`, `height`, `weight`, `priority` and
+                `delay` fields, in the same order.
+        """
+        n = len(package_ids)
+        self.package_ids = list(package_ids)
+        self.length = np.asarray(columns["length"], dtype=np.int64)
+        self.width = np.asarray(columns["width"], dtype=np.int64)
+        self.height = np.asarray(columns["height"], dtype=np.int64)
+        self.weight = np.asarray(columns["weight"], dtype=np.int64)
+        self.priority = np.asarray(columns["priority"], dtype=np.int8)
+        self.delay = np.asarray(columns["delay"], dtype=np.int64)
+        self.origin = np.zeros((n, 3), dtype=np.int64)
+        self.placed = np.zeros(n, dtype=bool)
+        self.loaded = np.full(n, -1, dtype=np.int32)
+        self.uld_ids = []
+        self.uld_codes = {}
+        self.shared = set()
+        self.recompute_cost_totals()
+
+    def __len__(self):
+        return len(self.package_ids)
+
+    def __repr__(self):
+        return f"PackageTable({len(self)} packages)"
+
+    def uld_code(self, uld_id):
+        """
+        Returns the code of a ULD ID, assigning a new code to unseen IDs.
+
+        Args:
+            uld_id (str or None): The ULD ID.
+
+        Returns:
+            int: The code of the ULD, or -1 for None.
+        """
+        if uld_id is None:
+            return -1
+        code = self.uld_codes.get(uld_id)
+        if code is None:
+            code = len(self.uld_ids)
+            self.uld_ids.append(uld_id)
+            self.uld_codes[uld_id] = code
+        return code
+
+    def column(self, field):
+        """
+        Returns an array of the table for writing, copying it first if it is shared with a snapshot.
+
+        Args:
+            field (str): Name of the array.
+
+        Returns:
+            np.ndarray: The array, owned by the table.
+        """
+        if field in self.shared:
+            setattr(self, field, getattr(self, field).copy())
+            self.shared.discard(field)
+        return getattr(self, field)
+
+    def snapshot(self):
+        """
+        Records the state of the table. The arrays are shared with the table until it writes them.
+
+        Returns:
+            tuple: The arrays, keyed by name, and the running cost totals.
+        """
+        self.shared = set(self.ARRAY_FIELDS)
+        arrays = {field: getattr(self, field) for field in self.ARRAY_FIELDS}
+        return arrays, (dict(self.priority_uld_counts), self.unloaded_economy_delay, self.n_loaded)
+
+    def restore(self, snapshot):
+        """
+        Restores the table to a state recorded by `snapshot`. The snapshot stays valid, and can be restored again.
+
+        Args:
+            snapshot (tuple): The state returned by `snapshot`.
+        """
+        arrays, (priority_uld_counts, unloaded_economy_delay, n_loaded) = snapshot
+        for field, array in arrays.items():
+            setattr(self, field, array)
+        self.shared = set(self.ARRAY_FIELDS)
+        self.priority_uld_counts = dict(priority_uld_counts)
+        self.unloaded_economy_delay = unloaded_economy_delay
+        self.n_loaded = n_loaded
+
+    def view(self, row):
+        """
+        Returns a Package viewing one row of the table.
+
+        Args:
+            row (int): The row.
+
+        Returns:
+            Package: The package of the row.
+        """
+        package = Package.__new__(Package)
+        package.package_id = self.package_ids[row]
+        package.table = self
+        package.row = row
+        return package
+
+    def recompute_cost_totals(self):
+        """
+        Recomputes the running cost totals from the `priority`, `delay` and `loaded` arrays. Only needed after
+        writing the arrays directly, the Package properties keep the totals up to date.
+        """
+        is_priority = self.priority != 0
+        codes, counts = np.unique(self.loaded[is_priority & (self.loaded >= 0)], return_counts=True)
+        self.priority_uld_counts = {
+            code: count for code, count in zip(codes.tolist(), counts.tolist()) if self.uld_ids[code]
+        }
+        self.unloaded_economy_delay = int(self.delay[~is_priority & (self.loaded < 0)].sum())
+        self.n_loaded = int(np.count_nonzero(self.loaded >= 0))
+
+    def _account(self, row, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) the contribution of one row to the running cost totals.
+
+        Args:
+            row (int): The row.
+            sign (int): 1 or -1.
+        """
+        code = int(self.loaded[row])
+        if code < 0:
+            if not self.priority[row]:
+                self.unloaded_economy_delay += sign * int(self.delay[row])
+            return
+        self.n_loaded += sign
+        if self.priority[row] and self.uld_ids[code]:
+            count = self.priority_uld_counts.get(code, 0) + sign
+            if count:
+                self.priority_uld_counts[code] = count
+            else:
+                del self.priority_uld_counts[code]
+
+    def set_loaded(self, row, uld_id):
+        """
+        Loads a package into a ULD, or unloads it, updating the running cost totals.
+
+        Args:
+            row (int): The row of the package.
+            uld_id (str or None): ID of the ULD, or None to unload the package.
+        """
+        self._account(row, -1)
+        self.column("loaded")[row] = self.uld_code(uld_id)
+        self._account(row, 1)
+
+    def set_cost_field(self, row, field, value):
+        """
+        Sets the `priority` or `delay` of a package, updating the running cost totals.
+
+        Args:
+            row (int): The row of the package.
+            field (str): "priority" or "delay".
+            value (int): The new value.
+        """
+        self._account(row, -1)
+        self.column(field)[row] = value
+        self._account(row, 1)
+
+    def cost_terms(self):
+        """
+        Returns the terms of OptimalCargoManagement.cost over all the packages of the table, in O(1).
+
+        Returns:
+            tuple: The number of ULDs holding a priority package and the total delay of the unloaded
+                economy packages.
+        """
+        return len(self.priority_uld_counts), self.unloaded_economy_delay
+
+    def num_loaded(self):
+        """
+        Counts the packages loaded into ULDs, in O(1).
+
+        Returns:
+            int: Number of loaded packages.
+        """
+        return self.n_loaded
+
+
+def _column_property(field, doc, cost_field=False):
+    """
+    Creates a property reading and writing one field of a Package in its PackageTable. Writes to the fields
+    the cost depends on go through the table, to keep its running totals up to date.
+    """
+    def get(self):
+        return int(getattr(self.table, field)[self.row])
+    def set(self, value):
+        self.table.column(field)[self.row] = value
+    def set_cost_field(self, value):
+        self.table.set_cost_field(self.row, field, value)
+    return property(get, set_cost_field if cost_field else set, doc=doc)
+
 
 class Package:
     """
-    Represents a package with physical dimensions, weight, priority, and loading details.
+    Represents a package with physical dimensions, weight, priority, and loading details. A Package is a view
+    over one row of a PackageTable; a package created on its own gets a table of one row.
 
     Attributes:
         package_id (str): Unique identifier for the package.
@@ -12,19 +246,82 @@ class Package:
         weight (int): Weight of the package.
         priority (int): Priority level (1 for priority, 0 otherwise).
         delay (int): Acceptable delay in loading the package.
-        corners (list[tuple[int, int, int]]): Coordinates of the package's corners.
+        corners (list[tuple[int, int, int]]): Coordinates of the package's corners, computed from its reference
+            corner and dimensions.
         loaded (str or None): ID of the ULD where the package is loaded, or `None` if not loaded.
+        table (PackageTable): The table holding the package.
+        row (int): The row of the package in the table.
     """
+    __slots__ = ("package_id", "table", "row")
+
+    length = _column_property("length", "Length of the package.")
+    width = _column_property("width", "Width of the package.")
+    height = _column_property("height", "Height of the package.")
+    weight = _column_property("weight", "Weight of the package.")
+    priority = _column_property("priority", "Priority level (1 for priority, 0 otherwise).", cost_field=True)
+    delay = _column_property("delay", "Acceptable delay in loading the package.", cost_field=True)
+
     def __init__(self, package_id, length, width, height, weight, priority, delay):
         self.package_id = package_id
-        self.length = length
-        self.width = width
-        self.height = height
-        self.weight = weight
-        self.priority = priority
-        self.delay = delay
-        self.corners = []
-        self.loaded = None
+        self.table = PackageTable([package_id], {
+            "length": [length], "width": [width], "height": [height],
+            "weight": [weight], "priority": [priority], "delay": [delay],
+        })
+        self.row = 0
+
+    @property
+    def loaded(self):
+        """
+        str or None: ID of the ULD where the package is loaded, or `None` if not loaded.
+        """
+        code = self.table.loaded[self.row]
+        return None if code < 0 else self.table.uld_ids[code]
+
+    @loaded.setter
+    def loaded(self, uld_id):
+        self.table.set_loaded(self.row, uld_id)
+
+    @property
+    def reference_corner(self):
+        """
+        tuple[int, int, int] or None: The minimum corner of the package (`corners[0]`), or None if its corners
+        have not been generated.
+        """
+        if not self.table.placed[self.row]:
+            return None
+        return tuple(self.table.origin[self.row].tolist())
+
+    @property
+    def far_corner(self):
+        """
+        tuple[int, int, int] or None: The maximum corner of the package (`corners[7]`), or None if its corners
+        have not been generated.
+        """
+        if not self.table.placed[self.row]:
+            return None
+        x, y, z = self.table.origin[self.row].tolist()
+        return (x + self.length, y + self.width, z + self.height)
+
+    @property
+    def corners(self):
+        """
+        list[tuple[int, int, int]]: Coordinates of the package's corners, or an empty list if they have not
+        been generated.
+        """
+        if not self.table.placed[self.row]:
+            return []
+        x, y, z = self.table.origin[self.row].tolist()
+        length, width, height = self.length, self.width, self.height
+        return [
+            (x, y, z), 
+            (x + length, y, z), 
+            (x, y + width, z), 
+            (x + length, y + width, z), 
+            (x, y, z + height), 
+            (x + length, y, z + height), 
+            (x, y + width, z + height), 
+            (x + length, y + width, z + height)
+        ]
 
     def center(self):
         """
@@ -57,7 +354,7 @@ class Package:
 
     def generate_corners(self, reference_corner):
         """
-        Generates the eight corners of the package based on its reference corner.
+        Places the package at its reference corner. The corners are computed from it when read.
 
         Args:
             reference_corner (tuple[int, int, int]): The (x, y, z) coordinates of the reference corner.
@@ -65,17 +362,8 @@ class Package:
         Returns:
             list[tuple[int, int, int]]: List of coordinates representing the package's corners.
         """
-        x, y, z = reference_corner
-        self.corners = [
-            (x, y, z), 
-            (x + self.length, y, z), 
-            (x, y + self.width, z), 
-            (x + self.length, y + self.width, z), 
-            (x, y, z + self.height), 
-            (x + self.length, y, z + self.height), 
-            (x, y + self.width, z + self.height), 
-            (x + self.length, y + self.width, z + self.height)
-        ]
+        self.table.column("origin")[self.row] = reference_corner
+        self.table.column("placed")[self.row] = True
         return self.corners
 
     def reorient(self, z_index):
@@ -94,6 +382,86 @@ class Package:
         self.height = max(rest_dimensions)
         self.length = min(rest_dimensions)
 
+class LazyPackages(MutableMapping):
+    """
+    Dictionary of packages keyed by package ID, backed by a PackageTable. The Package view of a row is only
+    created the first time it is accessed, and is kept from then on.
+
+    Attributes:
+        table (PackageTable): The table holding the packages of the manifest.
+        row_of (dict): Row of every package of the manifest in `table`, keyed by package ID.
+        created (dict): Packages created or set so far, keyed by package ID.
+        order (list): Package IDs in insertion order.
+        table_backed (bool): Whether the mapping holds exactly the rows of `table`, so that bulk operations
+            can run on the table.
+    """
+    def __init__(self, table):
+        """
+        Initializes a LazyPackages object.
+
+        Args:
+            table (PackageTable): The table holding the packages.
+        """
+        self.table = table
+        self.row_of = {package_id: row for row, package_id in enumerate(table.package_ids)}
+        self.created = {}
+        self.order = list(self.row_of)
+        self.table_backed = len(self.row_of) == len(table)
+
+    def __getitem__(self, package_id):
+        package = self.created.get(package_id)
+        if package is None:
+            package = self.table.view(self.row_of[package_id])
+            self.created[package_id] = package
+        return package
+
+    def __setitem__(self, package_id, package):
+        if package_id not in self:
+            self.order.append(package_id)
+        row = self.row_of.get(package_id)
+        if not (package.table is self.table and package.row == row):
+            self.row_of.pop(package_id, None)
+            self.table_backed = False
+        self.created[package_id] = package
+
+    def __delitem__(self, package_id):
+        if package_id not in self:
+            raise KeyError(package_id)
+        self.order.remove(package_id)
+        self.row_of.pop(package_id, None)
+        self.created.pop(package_id, None)
+        self.table_backed = False
+
+    def __contains__(self, package_id):
+        return package_id in self.row_of or package_id in self.created
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __repr__(self):
+        return f"LazyPackages({len(self)} packages, {len(self.created)} created)"
+
+    def cost_terms(self):
+        """
+        Returns the terms of OptimalCargoManagement.cost kept by the table, see PackageTable.cost_terms.
+
+        Returns:
+            tuple or None: The terms, or None if the mapping is no longer backed by the table alone.
+        """
+        return self.table.cost_terms() if self.table_backed else None
+
+    def num_loaded(self):
+        """
+        Counts the loaded packages on the table, see PackageTable.num_loaded.
+
+        Returns:
+            int or None: The count, or None if the mapping is no longer backed by the table alone.
+        """
+        return self.table.num_loaded() if self.table_backed else None
+
 def single_dimension_match(package_1_dimensions, package_2_dimensions):
     """
     Checks if any dimension of one package matches any dimension of another package.
@@ -126,46 +494,74 @@ def single_dimension_match_by_index(package_1_dimensions, package_2_dimensions,
         return package_2_dimensions.index(package_1_dimensions[index]) + 1
     return False
 
-def crainic_sorting(packages_list, group_on_dimensions=False, reverse=False):
+@lru_cache(maxsize=32)
+def crainic_matches(packages_dimensions):
     """
-    Sorts packages using Crainic's grouping and matching heuristic based on dimensions.
+    Computes the dimension matches of Crainic's heuristic. Each package not matched yet, in order, takes as
+    its group the unmatched packages sharing its dimension with the most such packages. An inverted index
+    from dimension value to packages finds the packages sharing a dimension without comparing every pair.
+    The matches only depend on the packages' IDs and dimensions, so they are memoized.
 
     Args:
-        packages_list (list[Package]): List of packages to be sorted.
-        group_on_dimensions (bool, optional): Whether to group packages by a specific dimension. Defaults to False.
-        reverse (bool, optional): Whether to reverse the sorting order. Defaults to False.
+        packages_dimensions (tuple[tuple[str, int, int, int]]): ID, length, width and height of every package.
 
     Returns:
-        list[tuple[str, int]]: List of package IDs with their corresponding orientations, in sorted order.
+        tuple[tuple[str, tuple[tuple[str, int]], int]]: For every group leader, its ID, the (ID, orientation)
+            pairs of the packages matched to it and the index (1-based) of the dimension they share.
     """
-    packages_dimensions_dict = {}
-    for package in packages_list:
-        packages_dimensions_dict[package.package_id] = [package.length, package.width, package.height]
+    dimension_index = {}
+    for package_id, *package_dimensions in packages_dimensions:
+        for value in dict.fromkeys(package_dimensions):
+            dimension_index.setdefault(value, []).append((package_id, package_dimensions.index(value) + 1))
 
-    matches_by_dimension = {}
+    matches = []
     matched_packages = set()
-    for package_id, package_dimensions in packages_dimensions_dict.items():
+    for package_id, *package_dimensions in packages_dimensions:
         if package_id not in matched_packages:
             dim_matches_map = {1: [], 2: [], 3: []}
             for i in dim_matches_map.keys():
-                for other_package_id, other_package_dimensions in packages_dimensions_dict.items():
-                    if package_id != other_package_id and single_dimension_match_by_index(package_dimensions, other_package_dimensions, i - 1) and other_package_id not in matched_packages:
-                        dim_matches_map[i].append((other_package_id, single_dimension_match_by_index(package_dimensions, other_package_dimensions, i - 1)))
+                value = package_dimensions[i - 1]
+                # Drop the packages matched since the last lookup, so they are only skipped once
+                candidates = [entry for entry in dimension_index[value] if entry[0] not in matched_packages]
+                dimension_index[value] = candidates
+                dim_matches_map[i] = [entry for entry in candidates if entry[0] != package_id]
 
             max_match_index = max(dim_matches_map, key=lambda x: len(dim_matches_map[x]))
-            matches_by_dimension[package_id] = (dim_matches_map[max_match_index], max_match_index)
+            matches.append((package_id, tuple(dim_matches_map[max_match_index]), max_match_index))
             for match in dim_matches_map[max_match_index]:
                 matched_packages.add(match[0])
             matched_packages.add(package_id)
+    return tuple(matches)
+
+def crainic_sorting(packages_list, group_on_dimensions=False, reverse=False):
+    """
+    Sorts packages using Crainic's grouping and matching heuristic based on dimensions.
+
+    Args:
+        packages_list (list[Package]): List of packages to be sorted.
+        group_on_dimensions (bool, optional): Whether to group packages by a specific dimension. Defaults to False.
+        reverse (bool, optional): Whether to reverse the sorting order. Defaults to False.
+
+    Returns:
+        list[tuple[str, int]]: List of package IDs with their corresponding orientations, in sorted order.
+    """
+    packages_dimensions_dict = {}
+    for package in packages_list:
+        packages_dimensions_dict[package.package_id] = [package.length, package.width, package.height]
+    cache_hits = crainic_matches.cache_info().hits
+    matches_by_dimension = crainic_matches(tuple(
+        (package_id, *package_dimensions) for package_id, package_dimensions in packages_dimensions_dict.items()
+    ))
+    PROFILER.count("ordering.crainic_cache_hits", crainic_matches.cache_info().hits - cache_hits)
 
     order = []
     groups = []
     dimension_group_order = {}
 
-    for package_id, item_details in matches_by_dimension.items():
-        first_package, first_package_orientation = package_id, item_details[1]
+    for package_id, package_matches, first_package_orientation in matches_by_dimension:
+        first_package = package_id
         new_group = [(first_package, first_package_orientation)]
-        for package_orientation_pair in item_details[0]:
+        for package_orientation_pair in package_matches:
             new_group.append(package_orientation_pair)
         random.shuffle(new_group)
         main_package_dimensions = packages_dimensions_dict[first_package]
@@ -0,0 +1,266 @@
+import sys
+import math
+import random
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io_utils import parse_input
+from ocm import OptimalCargoManagement
+from validator import SolutionValidator, IncrementalValidator
+
+
+class ConfigurationCancelled(Exception):
+    """
+    Raised inside a worker when a configuration can no longer beat the best known solution.
+    """
+
+
+_best_known_cost = None
+_best_known_index = None
+
+def _init_portfolio_worker(best_known_cost, best_known_index):
+    """
+    Pool initializer: keeps the cost and configuration index of the best known solution, shared by all workers.
+
+    Args:
+        best_known_cost (multiprocessing.Value): Cost of the best valid solution found so far.
+        best_known_index (multiprocessing.Value): Index of the configuration that found it. Updated under the
+            lock of `best_known_cost`.
+    """
+    global _best_known_cost, _best_known_index
+    _best_known_cost = best_known_cost
+    _best_known_index = best_known_index
+
+def _check_partial_cost(ocm, configuration, configuration_index):
+    """
+    Cancels a configuration if a lower bound of its final cost shows it cannot beat the best known solution.
+    Once the priority packages are placed, the number of priority ULDs can no longer decrease, so
+    K times that number bounds the final cost from below. Ties go to the configuration of lowest index, as in
+    PortfolioSolver.solve_iter, so a configuration reaching the best known cost is only cancelled if its index
+    is higher.
+
+    Args:
+        ocm (OptimalCargoManagement): The partial solution of the configuration.
+        configuration (dict): The configuration being run.
+        configuration_index (int): Index of the configuration in the portfolio.
+
+    Raises:
+        ConfigurationCancelled: If the configuration cannot improve on the best known solution.
+    """
+    if _best_known_cost is None:
+        return
+    lower_bound = ocm.cost(only_priority=True) * ocm.K
+    with _best_known_cost.get_lock():
+        best_known = (_best_known_cost.value, _best_known_index.value)
+    if (lower_bound, configuration_index) > best_known:
+        raise ConfigurationCancelled(f"{configuration}: partial cost {lower_bound} >= best known cost {best_known[0]}")
+
+def run_configuration(input_file, configuration, seed, configuration_index=0, verbose=False):
+    """
+    Runs one configuration of the portfolio on a fresh copy of the input, with its own seed.
+
+    Args:
+        input_file (str): Path to the input file.
+        configuration (dict): `{"solver": "ga"}` or `{"solver": "greedy", "top_k": k}`, with an optional
+            `"engine"` of OptimalCargoManagement.fit_greedy (default "rows").
+        seed (int): Seed of the random generators for this configuration.
+        configuration_index (int, optional): Index of the configuration in the portfolio, breaking ties between
+            equal costs. Default is 0.
+        verbose (bool, optional): Enables verbose logging if set to True. Default is False.
+
+    Returns:
+        tuple or None: The cost and placements of the solution, or None if it is invalid. Each placement is
+            (package_id, uld_id, reference_corner, (length, width, height)).
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+
+    ulds, packages, K = parse_input(input_file)
+    ocm = OptimalCargoManagement(ulds, packages, K, verbose)
+    validator = IncrementalValidator(ocm, verbose)
+    priority_ordering, economy_ordering = ocm.create_package_ordering()
+
+    if configuration["solver"] == "ga":
+        # Checked between the priority and the non-priority GA, the bound only depending on the priority ULDs
+        ocm.run_genetic_algorithm(after_priority=lambda solution: _check_partial_cost(solution, configuration, configuration_index))
+    else:
+        ocm.reorient_packages()
+        largest_ulds_by_volume = sorted(
+            ocm.ulds.keys(),
+            key=lambda x: ((ocm.ulds[x].length * ocm.ulds[x].width * ocm.ulds[x].height), x),
+            reverse=True
+        )[:configuration["top_k"]]
+        engine = configuration.get("engine", "rows")
+        ocm.fit_greedy(optional_ordering=priority_ordering, selected_ulds=largest_ulds_by_volume, engine=engine)
+        _check_partial_cost(ocm, configuration, configuration_index)
+        ocm.fit_greedy(optional_ordering=economy_ordering, selected_ulds=ocm.unused_uld_ids(), engine=engine)
+
+    _check_partial_cost(ocm, configuration, configuration_index)
+    ocm.adhoc_additions()
+
+    if not validator.is_valid():
+        return None
+    placements = [
+        (package.package_id, package.loaded, package.reference_corner, (package.length, package.width, package.height))
+        for package in ocm.packages.values() if package.loaded
+    ]
+    return ocm.cost(), placements
+
+
+class PortfolioSolver(object):
+    """
+    Runs the genetic algorithm and greedy/top_k configurations of OptimalCargoManagement concurrently,
+    each in its own worker process with an independent seed, and keeps the best valid solution.
+
+    Attributes:
+        input_file (str): Path to the input file.
+        configurations (list): The configurations to run.
+        n_workers (int): Number of worker processes.
+        seed (int): Base seed from which each configuration's seed is derived.
+        verbose (bool): Whether to enable verbose logging.
+        best_cost (float): Cost of the best valid solution found so far.
+        best_index (int): Index of the configuration that produced the best solution; ties between equal costs go
+            to the lowest index, so the result does not depend on the order in which configurations finish.
+        best_configuration (dict): Configuration that produced the best solution.
+        best_placements (list): Placements of the best solution.
+    """
+
+    def __init__(self, input_file, configurations=None, n_workers=None, seed=28072, greedy_iterations=2, verbose=False):
+        """
+        Initializes the PortfolioSolver instance.
+
+        Args:
+            input_file (str): Path to the input file.
+            configurations (list, optional): The configurations to run. Default is the genetic algorithm plus
+                `greedy_iterations` greedy passes for every top_k tried by `main.py`.
+            n_workers (int, optional): Number of worker processes. Default is the number of cores.
+            seed (int, optional): Base seed from which each configuration's seed is derived. Default is 28072.
+            greedy_iterations (int, optional): Number of greedy passes per top_k in the default configurations.
+                Default is 2.
+            verbose (bool, optional): Enables verbose logging if set to True. Default is False.
+        """
+        self.input_file = input_file
+        self.verbose = verbose
+        self.seed = seed
+        self.n_workers = n_workers or multiprocessing.cpu_count() or 1
+        self.configurations = configurations if configurations is not None else self.default_configurations(greedy_iterations)
+        self.best_cost = math.inf
+        self.best_index = len(self.configurations)
+        self.best_configuration = None
+        self.best_placements = None
+
+    def log(self, message):
+        """
+        Logs a message if verbose mode is enabled.
+
+        Args:
+            message (str): The message to log.
+        """
+        if self.verbose:
+            print(message)
+
+    def default_configurations(self, greedy_iterations):
+        """
+        Builds the configurations run by `main.py`: the genetic algorithm, and every top_k for each greedy pass.
+
+        Args:
+            greedy_iterations (int): Number of greedy passes per top_k.
+
+        Returns:
+            list: The configurations.
+        """
+        ulds, packages, K = parse_input(self.input_file)
+        ocm = OptimalCargoManagement(ulds, packages, K)
+        configurations = [{"solver": "ga"}]
+        for iteration in range(greedy_iterations):
+            for top_k in range(min(ocm.MIN_PRIORITY_ULDS, len(ocm.ulds)//2) + 1, len(ocm.ulds)+1):
+                configurations.append({"solver": "greedy", "top_k": top_k, "iteration": iteration})
+        return configurations
+
+    def configuration_seeds(self):
+        """
+        Derives an independent seed for every configuration from the base seed.
+
+        Returns:
+            list: One seed per configuration.
+        """
+        children = np.random.SeedSequence(self.seed).spawn(len(self.configurations))
+        return [int(child.generate_state(1)[0]) for child in children]
+
+    def solve_iter(self):
+        """
+        Runs all configurations and yields each new best valid solution as results arrive.
+        Configurations that can no longer beat the best known solution are cancelled early.
+
+        Yields:
+            tuple: The cost, configuration and placements of each improving solution.
+        """
+        best_known_cost = multiprocessing.Value('d', math.inf)
+        best_known_index = multiprocessing.Value('i', len(self.configurations), lock=False)
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_portfolio_worker,
+                                 initargs=(best_known_cost, best_known_index)) as executor:
+            futures = {
+                executor.submit(run_configuration, self.input_file, configuration, seed, i, self.verbose): i
+                for i, (configuration, seed) in enumerate(zip(self.configurations, self.configuration_seeds()))
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                configuration = self.configurations[index]
+                try:
+                    result = future.result()
+                except ConfigurationCancelled as e:
+                    self.log(f"Cancelled {e}")
+                    continue
+                if result is None:
+                    self.log(f"Configuration {configuration} gave an invalid solution")
+                    continue
+
+                cost, placements = result
+                self.log(f"Configuration {configuration} gave a valid solution of cost {cost}")
+                if (cost, index) < (self.best_cost, self.best_index):
+                    self.best_cost, self.best_index = cost, index
+                    self.best_configuration, self.best_placements = configuration, placements
+                    with best_known_cost.get_lock():
+                        best_known_cost.value, best_known_index.value = cost, index
+                    yield cost, configuration, placements
+
+    def solve(self):
+        """
+        Runs all configurations and returns the best valid solution, applied to a fresh copy of the input.
+
+        Returns:
+            OptimalCargoManagement or None: The best valid solution, or None if no configuration gave one.
+        """
+        for cost, configuration, _ in self.solve_iter():
+            self.log(f"New best solution of cost {cost} from {configuration}")
+        if self.best_placements is None:
+            return None
+
+        ulds, packages, K = parse_input(self.input_file)
+        ocm = OptimalCargoManagement(ulds, packages, K, self.verbose)
+        for package_id, uld_id, reference_corner, orientation in self.best_placements:
+            package = ocm.packages[package_id]
+            package.length, package.width, package.height = orientation
+            package.generate_corners(reference_corner)
+            package.loaded = uld_id
+            ocm.ulds[uld_id].add_package(package)
+        return ocm
+
+
+if __name__ == "__main__":
+    input_file = sys.argv[1]
+    output_file = sys.argv[2]
+    verbose = True if sys.argv[3] == "1" else False
+    n_workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    solver = PortfolioSolver(input_file, n_workers=n_workers, verbose=verbose)
+    best_ocm = solver.solve()
+    if best_ocm is None:
+        print("No valid solution found.")
+        sys.exit(1)
+
+    sv = SolutionValidator(best_ocm, verbose)
+    sv.validate()
+    print(f"Best solution from {solver.best_configuration} is {'valid' if sv.is_valid() else 'invalid'}.")
+    print("Best solution cost: ", best_ocm.cost())
+    best_ocm.file_output_ocm(output_file)
@@ -0,0 +1,227 @@
+import json
+import time
+import functools
+from contextlib import nullcontext
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    """
+    Context manager timing one call of a phase.
+    """
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_phase_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Records the wall time and number of calls of the phases of the solver, counters (e.g. GA evaluations,
+    cache hits) and distributions of observed values (e.g. EMS list sizes). When disabled, every method returns
+    immediately, so the instrumentation can stay in the hot paths.
+
+    Recording is per process: the workers of a multiprocessing pool record in their own Profiler, and send
+    their `records()` back to be merged in the parent with `merge`.
+
+    Attributes:
+        enabled (bool): Whether recording is on.
+        phases (dict): [total seconds, calls] of every phase, keyed by name. Nested phases are timed inclusively.
+        counters (dict): Value of every counter, keyed by name.
+        observations (dict): [count, total, min, max] of the values observed for every name.
+        start_time (float): `time.perf_counter()` value when recording was enabled.
+    """
+
+    def __init__(self, enabled=False):
+        """
+        Initializes a Profiler.
+
+        Args:
+            enabled (bool, optional): Whether recording is on. Default is False.
+        """
+        self.enabled = False
+        self.reset()
+        if enabled:
+            self.enable()
+
+    def __repr__(self):
+        return f"Profiler(enabled={self.enabled}, {len(self.phases)} phases, {len(self.counters)} counters)"
+
+    def reset(self):
+        """
+        Clears everything recorded so far.
+        """
+        self.phases = {}
+        self.counters = {}
+        self.observations = {}
+        self.start_time = time.perf_counter()
+
+    def enable(self):
+        """
+        Turns recording on, clearing everything recorded so far.
+        """
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """
+        Turns recording off. What was recorded is kept.
+        """
+        self.enabled = False
+
+    def phase(self, name):
+        """
+        Returns a context manager timing a phase.
+
+        Args:
+            name (str): Name of the phase.
+
+        Returns:
+            context manager: Timer of the phase, or a no-op when disabled.
+        """
+        return _Phase(self, name) if self.enabled else _NULL_PHASE
+
+    def add_phase_time(self, name, seconds):
+        """
+        Records one call of a phase.
+
+        Args:
+            name (str): Name of the phase.
+            seconds (float): Wall time of the call.
+        """
+        record = self.phases.get(name)
+        if record is None:
+            self.phases[name] = [seconds, 1]
+        else:
+            record[0] += seconds
+            record[1] += 1
+
+    def count(self, name, value=1):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): Name of the counter.
+            value (int, optional): Amount to add. Default is 1.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """
+        Records an observed value, e.g. the size of a list, keeping its count, total, minimum and maximum.
+
+        Args:
+            name (str): Name of the observed quantity.
+            value (float): The value.
+        """
+        if not self.enabled:
+            return
+        record = self.observations.get(name)
+        if record is None:
+            self.observations[name] = [1, value, value, value]
+        else:
+            record[0] += 1
+            record[1] += value
+            if value < record[2]:
+                record[2] = value
+            if value > record[3]:
+                record[3] = value
+
+    def records(self):
+        """
+        Returns everything recorded so far, to be merged in another Profiler, e.g. from a pool worker.
+
+        Returns:
+            tuple: The phases, counters and observations.
+        """
+        return self.phases, self.counters, self.observations
+
+    def merge(self, records):
+        """
+        Adds the records of another Profiler to this one. Phase times are summed, so the phases recorded by
+        parallel workers add up to their total time rather than to the wall time.
+
+        Args:
+            records (tuple): The phases, counters and observations returned by `records`.
+        """
+        phases, counters, observations = records
+        for name, (seconds, calls) in phases.items():
+            record = self.phases.setdefault(name, [0.0, 0])
+            record[0] += seconds
+            record[1] += calls
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for name, (count, total, minimum, maximum) in observations.items():
+            record = self.observations.get(name)
+            if record is None:
+                self.observations[name] = [count, total, minimum, maximum]
+            else:
+                record[0] += count
+                record[1] += total
+                record[2] = min(record[2], minimum)
+                record[3] = max(record[3], maximum)
+
+    def report(self):
+        """
+        Returns everything recorded, as a JSON-serializable dict.
+
+        Returns:
+            dict: The total wall time, the phases sorted by decreasing time, the counters and the observations.
+        """
+        return {
+            "wall_seconds": time.perf_counter() - self.start_time,
+            "phases": {
+                name: {"seconds": seconds, "calls": calls, "seconds_per_call": seconds / calls}
+                for name, (seconds, calls) in sorted(self.phases.items(), key=lambda item: -item[1][0])
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "observations": {
+                name: {"count": count, "mean": total / count, "min": minimum, "max": maximum}
+                for name, (count, total, minimum, maximum) in sorted(self.observations.items())
+            },
+        }
+
+    def write_json(self, file_path):
+        """
+        Writes the report to a JSON file.
+
+        Args:
+            file_path (str): Path to the JSON file.
+        """
+        with open(file_path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+
+# Profiler shared by the modules of the solver, disabled unless a caller enables it
+PROFILER = Profiler()
+
+def profiled(name):
+    """
+    Decorator timing every call of a function as a phase of PROFILER.
+
+    Args:
+        name (str): Name of the phase.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            with _Phase(PROFILER, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
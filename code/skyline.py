@@ -0,0 +1,225 @@
+from bisect import bisect_left, insort
+from itertools import islice, permutations
+
+
+class Skyline:
+    """
+    Free surface of a vertical slab of a ULD, seen from the front: the slab is split along x into segments,
+    each with the height z up to which it is filled. Adjacent segments of equal height are merged.
+
+    Besides the segments sorted by x, the (z, x) pairs are kept sorted by height, so that the lowest segments
+    are found by bisection and a placement only touches the segments it covers. A search tries at most
+    SEARCH_WIDTH of the lowest segments, which bounds its cost on skylines with many segments.
+
+    Attributes:
+        length (int): Length of the slab along x.
+        height (int): Height of the slab along z.
+        xs (list): Start x of every segment, sorted.
+        zs (list): Filled height of every segment, in the order of `xs`.
+        by_height (list): (z, x) of every segment, sorted.
+    """
+    SEARCH_WIDTH = 32
+
+    def __init__(self, length, height):
+        """
+        Initializes an empty Skyline.
+
+        Args:
+            length (int): Length of the slab along x.
+            height (int): Height of the slab along z.
+        """
+        self.length = length
+        self.height = height
+        self.xs = [0]
+        self.zs = [0]
+        self.by_height = [(0, 0)]
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __repr__(self):
+        return f"Skyline({list(zip(self.xs, self.zs))})"
+
+    def copy(self):
+        """
+        Returns an independent copy of the skyline.
+
+        Returns:
+            Skyline: The copy.
+        """
+        skyline = Skyline.__new__(Skyline)
+        skyline.length, skyline.height = self.length, self.height
+        skyline.xs, skyline.zs, skyline.by_height = self.xs[:], self.zs[:], self.by_height[:]
+        return skyline
+
+    def resting_height(self, x, length):
+        """
+        Returns the height at which a box spanning [x, x + length) rests on the skyline.
+
+        Args:
+            x (int): Start of the box along x, the start of a segment.
+            length (int): Length of the box along x.
+
+        Returns:
+            int: The highest filled height under the box.
+        """
+        i = bisect_left(self.xs, x)
+        end = bisect_left(self.xs, x + length)
+        return max(self.zs[i:end])
+
+    def find_position(self, length, height):
+        """
+        Finds the position where a box ends lowest, ties broken by the lowest x. The box is left-aligned on a
+        segment; at most SEARCH_WIDTH segments are tried, from the lowest one up, stopping as soon as no higher
+        segment can do better.
+
+        Args:
+            length (int): Length of the box along x.
+            height (int): Height of the box along z.
+
+        Returns:
+            tuple or None: The (x, z) of the box, or None if it does not fit.
+        """
+        if length > self.length or height > self.height:
+            return None
+        best = None
+        for segment_z, x in islice(self.by_height, self.SEARCH_WIDTH):
+            if segment_z + height > self.height or (best is not None and segment_z + height > best[1] + height):
+                break
+            if x + length > self.length:
+                continue
+            z = self.resting_height(x, length)
+            if z + height <= self.height and (best is None or (z, x) < (best[1], best[0])):
+                best = (x, z)
+        return best
+
+    def add_box(self, x, z, length, height):
+        """
+        Raises the skyline under a box placed at (x, z), merging the segments it covers.
+
+        Args:
+            x (int): Start of the box along x, the start of a segment.
+            z (int): Height the box rests at.
+            length (int): Length of the box along x.
+            height (int): Height of the box along z.
+        """
+        i = bisect_left(self.xs, x)
+        end_x = x + length
+        end = bisect_left(self.xs, end_x)
+        # The last covered segment continues after the box: split it
+        if end_x < self.length and (end == len(self.xs) or self.xs[end] != end_x):
+            self.xs.insert(end, end_x)
+            self.zs.insert(end, self.zs[end - 1])
+            insort(self.by_height, (self.zs[end], end_x))
+        for j in range(i, end):
+            del self.by_height[bisect_left(self.by_height, (self.zs[j], self.xs[j]))]
+        self.xs[i:end] = [x]
+        self.zs[i:end] = [z + height]
+        insort(self.by_height, (z + height, x))
+        self._merge(i)
+
+    def _merge(self, i):
+        """
+        Merges segment i with its neighbours of equal height.
+        """
+        if i + 1 < len(self.xs) and self.zs[i + 1] == self.zs[i]:
+            del self.by_height[bisect_left(self.by_height, (self.zs[i + 1], self.xs[i + 1]))]
+            del self.xs[i + 1], self.zs[i + 1]
+        if i > 0 and self.zs[i - 1] == self.zs[i]:
+            del self.by_height[bisect_left(self.by_height, (self.zs[i], self.xs[i]))]
+            del self.xs[i], self.zs[i]
+
+
+class SkylinePacker:
+    """
+    Greedy packing engine of a ULD. The ULD is filled with vertical slabs along y, like the planes of
+    ULD.uld_fill_greedy, but each slab keeps its skyline and stays open: a box goes in the first slab where it
+    fits, at the position where it ends lowest, and a new slab is only started behind the last one when no slab
+    has room left. The last slab grows to the width of the widest box it holds, earlier slabs have a fixed width.
+
+    Attributes:
+        length (int): Length of the ULD along x.
+        width (int): Width of the ULD along y.
+        height (int): Height of the ULD along z.
+        slabs (list): [y_start, depth, Skyline] of every slab, ordered along y.
+        y_filled (int): Width used by the slabs.
+    """
+
+    def __init__(self, length, width, height, y_start=0):
+        """
+        Initializes an empty SkylinePacker.
+
+        Args:
+            length (int): Length of the ULD along x.
+            width (int): Width of the ULD along y.
+            height (int): Height of the ULD along z.
+            y_start (int, optional): Width already used in front of the packer. Default is 0.
+        """
+        self.length = length
+        self.width = width
+        self.height = height
+        self.slabs = []
+        self.y_filled = y_start
+
+    def __repr__(self):
+        return f"SkylinePacker({len(self.slabs)} slabs, y_filled={self.y_filled})"
+
+    def copy(self):
+        """
+        Returns an independent copy of the packer.
+
+        Returns:
+            SkylinePacker: The copy.
+        """
+        packer = SkylinePacker(self.length, self.width, self.height, self.y_filled)
+        packer.slabs = [[y_start, depth, skyline.copy()] for y_start, depth, skyline in self.slabs]
+        return packer
+
+    def place(self, length, width, height):
+        """
+        Places a box in any of its orientations. In a slab, the orientation ending lowest is kept, preferring
+        the ones that do not deepen the last slab; a new slab is started with the thinnest orientation.
+
+        Args:
+            length (int): Length of the box.
+            width (int): Width of the box.
+            height (int): Height of the box.
+
+        Returns:
+            tuple or None: The reference corner (x, y, z) and the (length, width, height) of the placed box,
+                or None if it does not fit.
+        """
+        orientations = sorted(set(permutations((length, width, height))), key=lambda dims: dims != (length, width, height))
+        for slab_ind, (y_start, depth, skyline) in enumerate(self.slabs):
+            max_width = self.width - y_start if slab_ind == len(self.slabs) - 1 else depth
+            best = None
+            for box_length, box_width, box_height in orientations:
+                if box_width > max_width:
+                    continue
+                position = skyline.find_position(box_length, box_height)
+                if position is None:
+                    continue
+                key = (position[1] + box_height, box_width > depth, position[0])
+                if best is None or key < best[0]:
+                    best = (key, position, (box_length, box_width, box_height))
+            if best is not None:
+                _, (x, z), (box_length, box_width, box_height) = best
+                skyline.add_box(x, z, box_length, box_height)
+                if box_width > depth:
+                    self.slabs[slab_ind][1] = box_width
+                    self.y_filled = y_start + box_width
+                return (x, y_start, z), (box_length, box_width, box_height)
+
+        for box_length, box_width, box_height in sorted(orientations, key=lambda dims: (dims[1], dims[2])):
+            if self.y_filled + box_width > self.width:
+                break
+            skyline = Skyline(self.length, self.height)
+            position = skyline.find_position(box_length, box_height)
+            if position is not None:
+                x, z = position
+                skyline.add_box(x, z, box_length, box_height)
+                y_start = self.y_filled
+                self.slabs.append([y_start, box_width, skyline])
+                self.y_filled = y_start + box_width
+                return (x, y_start, z), (box_length, box_width, box_height)
+        return None
@@ -1,5 +1,7 @@
 from package import Package
 from cuboid import *
+from skyline import SkylinePacker
+from profiling import profiled
 
 class ULD:
     """
@@ -20,6 +22,11 @@ class ULD:
         last_plane_y (float): Y-coordinate of the last plane filled.
         last_filled_row_z (float): Z-coordinate of the last filled row.
         existing_cuboids (list): List of Cuboid objects representing the occupied space in the ULD.
+        cuboid_index (CuboidGrid): Spatial index of `existing_cuboids`, kept in sync as cuboids are added.
+        extreme_points (ExtremePointSet): Extreme points of `existing_cuboids`, kept in sync as cuboids are added.
+        skyline (SkylinePacker): State of `uld_fill_skyline`, or None before its first placement.
+        listeners (list): Objects notified of every placement (`on_place(uld, package)`) and of every
+            refresh (`on_refresh(uld)`) of the ULD.
     """
 
     def __init__(self, uld_id, length, width, height, capacity):
@@ -45,6 +52,36 @@ class ULD:
         self.last_plane_y = 0
         self.last_filled_row_z = 0
         self.existing_cuboids = []
+        self.cuboid_index = None
+        self.extreme_points = None
+        self.skyline = None
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """
+        Registers a listener notified of the placements made in the ULD and of its refreshes.
+
+        Args:
+            listener (object): Object implementing `on_place(uld, package)` and `on_refresh(uld)`.
+        """
+        self.listeners.append(listener)
+
+    def notify_placement(self, package):
+        """
+        Notifies the listeners that a package has been placed in the ULD.
+
+        Args:
+            package (Package): The placed package.
+        """
+        for listener in self.listeners:
+            listener.on_place(self, package)
+
+    def notify_refresh(self):
+        """
+        Notifies the listeners that the ULD is being refreshed.
+        """
+        for listener in self.listeners:
+            listener.on_refresh(self)
 
     def cost(self, K):
         """
@@ -65,6 +102,7 @@ class ULD:
         """
         Resets the ULD's state, clearing all loaded packages and occupied dimensions.
         """
+        self.notify_refresh()
         self.used_volume = 0
         self.used_weight = 0
         for package in self.packages.values():
@@ -74,6 +112,40 @@ class ULD:
         self.last_plane_y = 0
         self.last_filled_row_z = 0
         self.existing_cuboids = []
+        self.cuboid_index = None
+        self.extreme_points = None
+        self.skyline = None
+
+    def snapshot(self):
+        """
+        Records the loading state of the ULD: its packages, fill cursors and occupied space. The spatial index
+        and extreme points are not recorded, they are rebuilt from the cuboids when needed.
+
+        Returns:
+            tuple: The state of the ULD.
+        """
+        return (self.used_volume, self.used_weight, dict(self.packages), self.x_filled, self.y_filled, self.z_filled,
+                self.last_plane_y, self.last_filled_row_z, list(self.existing_cuboids),
+                self.skyline.copy() if self.skyline is not None else None)
+
+    def restore(self, state):
+        """
+        Restores the loading state recorded by `snapshot`. The listeners see a refresh of the ULD followed
+        by the placement of each of its packages.
+
+        Args:
+            state (tuple): The state returned by `snapshot`.
+        """
+        self.notify_refresh()
+        (self.used_volume, self.used_weight, packages, self.x_filled, self.y_filled, self.z_filled,
+         self.last_plane_y, self.last_filled_row_z, existing_cuboids, skyline) = state
+        self.packages = dict(packages)
+        self.skyline = skyline.copy() if skyline is not None else None
+        self.existing_cuboids = list(existing_cuboids)
+        self.cuboid_index = None
+        self.extreme_points = None
+        for package in self.packages.values():
+            self.notify_placement(package)
 
     def add_package(self, package):
         """
@@ -83,6 +155,7 @@ class ULD:
             package (Package): The package to be added.
         """
         self.packages[package.package_id] = package
+        self.notify_placement(package)
 
     def __repr__(self):
         """
@@ -114,6 +187,8 @@ class ULD:
             self.x_filled += package.length
             self.y_filled = max(self.last_plane_y + package.width, self.y_filled)
             self.z_filled = max(self.last_filled_row_z + package.height, self.z_filled)
+            self.skyline = None
+            self.notify_placement(package)
             return True
 
         # Handle overflow to a new row or plane
@@ -130,6 +205,8 @@ class ULD:
             self.x_filled = package.length
             self.y_filled = max(self.last_plane_y + package.width, self.y_filled)
             self.z_filled = self.last_filled_row_z + package.height
+            self.skyline = None
+            self.notify_placement(package)
             return True
         elif self.y_filled + package.width <= self.width:
             self.last_plane_y = self.y_filled
@@ -143,19 +220,59 @@ class ULD:
             self.y_filled = self.last_plane_y + package.width
             self.z_filled = package.height
             self.last_filled_row_z = 0
+            self.skyline = None
+            self.notify_placement(package)
             return True
         else:
             return False
 
+    def uld_fill_skyline(self, package):
+        """
+        Attempts to place a package in the ULD with the skyline engine: the package goes where it ends lowest
+        in the first slab with room for it, in any orientation, see SkylinePacker. The slabs start
+        behind the packages placed by `uld_fill_greedy`, and `uld_fill_greedy` continues behind the slabs.
+
+        Args:
+            package (Package): The package to be placed.
+
+        Returns:
+            bool: True if the package was successfully placed, otherwise False.
+        """
+        if self.skyline is None:
+            self.skyline = SkylinePacker(self.length, self.width, self.height, y_start=self.y_filled)
+        placement = self.skyline.place(package.length, package.width, package.height)
+        if placement is None:
+            return False
+        package_reference_corner, (package.length, package.width, package.height) = placement
+        self.packages[package.package_id] = package
+        package.loaded = self.uld_id
+        package.generate_corners(package_reference_corner)
+        self.y_filled = self.last_plane_y = self.skyline.y_filled
+        self.x_filled, self.z_filled, self.last_filled_row_z = 0, 0, 0
+        self.notify_placement(package)
+        return True
+
     def create_cuboid_environment(self):
         """
         Creates a cuboid representation of all loaded packages for spatial calculations.
         """
         self.existing_cuboids = [
-            Cuboid(box_package.corners[0], box_package.corners[7])
+            Cuboid(box_package.reference_corner, box_package.far_corner)
             for box_package in self.packages.values()
         ]
+        self.create_cuboid_index()
+
+    def create_cuboid_index(self):
+        """
+        Builds the spatial index and the extreme point set of the existing cuboids.
+        """
+        uld_cuboid = Cuboid((0, 0, 0), (self.length, self.width, self.height))
+        self.cuboid_index = CuboidGrid(uld_cuboid)
+        for cuboid in self.existing_cuboids:
+            self.cuboid_index.insert(cuboid)
+        self.extreme_points = ExtremePointSet(uld_cuboid, self.existing_cuboids)
 
+    @profiled("uld.fit_in_package")
     def fit_in_package(self, package):
         """
         Attempts to fit a package into the ULD by finding a suitable placement.
@@ -167,6 +284,8 @@ class ULD:
             bool or str: ULD ID if the package is successfully placed, otherwise False.
         """
         larger_uld_cuboid = Cuboid((0, 0, 0), (self.length, self.width, self.height))
+        if self.cuboid_index is None:
+            self.create_cuboid_index()
         possible_cuboid_dimensions = [
             (package.length, package.width, package.height),
             (package.width, package.length, package.height),
@@ -175,15 +294,18 @@ class ULD:
             (package.width, package.height, package.length),
             (package.length, package.height, package.width)
         ]
-        for cuboid_dimension in possible_cuboid_dimensions:
-            possible_placement = find_placement(cuboid_dimension, larger_uld_cuboid, self.existing_cuboids)
-            if possible_placement:
-                package.length, package.width, package.height = cuboid_dimension
-                package_reference_corner = possible_placement
-                package.generate_corners(package_reference_corner)
-                self.packages[package.package_id] = package
-                package.loaded = self.uld_id
-                new_package_cuboid = Cuboid(package.corners[0], package.corners[7])
-                self.existing_cuboids.append(new_package_cuboid)
-                return package.loaded
+        possible_placement = find_placement_batch(possible_cuboid_dimensions, larger_uld_cuboid, self.existing_cuboids,
+                                                  self.cuboid_index, self.extreme_points)
+        if possible_placement:
+            dimension_index, package_reference_corner = possible_placement
+            package.length, package.width, package.height = possible_cuboid_dimensions[dimension_index]
+            package.generate_corners(package_reference_corner)
+            self.packages[package.package_id] = package
+            package.loaded = self.uld_id
+            new_package_cuboid = Cuboid(package.reference_corner, package.far_corner)
+            self.existing_cuboids.append(new_package_cuboid)
+            self.cuboid_index.insert(new_package_cuboid)
+            self.extreme_points.add_cuboid(new_package_cuboid, *self.cuboid_index.bounds())
+            self.notify_placement(package)
+            return package.loaded
         return False
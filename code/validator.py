@@ -1,6 +1,36 @@
 from package import Package
 from uld import ULD
-from cuboid import Cuboid
+from cuboid import Cuboid, CuboidGrid
+from profiling import profiled
+
+def find_overlaps(cuboids, report_all=True):
+    """
+    Finds the pairs of intersecting cuboids with a sort-and-sweep along the x-axis: cuboids are visited by
+    increasing minimum x, and each one is only tested against the active cuboids whose x-extent it reaches.
+    This takes O(n log n + k) for k candidate pairs instead of testing all n^2 pairs.
+
+    Args:
+        cuboids (list): A list of Cuboid objects.
+        report_all (bool, optional): If False, stops at the first intersecting pair. Default is True.
+
+    Returns:
+        list: Pairs (i, j), with i < j, of indices of intersecting cuboids.
+    """
+    order = sorted(range(len(cuboids)), key=lambda i: cuboids[i].min_corner[0])
+    overlaps = []
+    active = []
+
+    for i in order:
+        cuboid = cuboids[i]
+        active = [j for j in active if cuboids[j].max_corner[0] > cuboid.min_corner[0]]
+        for j in active:
+            if cuboid.intersects(cuboids[j]):
+                overlaps.append((min(i, j), max(i, j)))
+                if not report_all:
+                    return overlaps
+        active.append(i)
+
+    return overlaps
 
 class SolutionValidator:
     """
@@ -11,11 +41,12 @@ class SolutionValidator:
         verbose (bool): Enables verbose logging if set to True.
         valid (bool): Indicates if the solution is valid.
         package_collection (dict): A dictionary mapping ULD IDs to the list of packages assigned to each ULD.
+        violations (list): Messages describing the violated constraints found by the last validation.
 
     Methods:
         log(message): Logs a message if verbose is enabled.
-        validate_uld(uld, packages): Validates a single ULD and checks that all packages fit inside without overlap.
-        validate(): Validates all ULDs in the solution, ensuring package constraints are met.
+        validate_uld(uld, packages, report_all): Validates a single ULD and checks that all packages fit inside without overlap.
+        validate(report_all): Validates all ULDs in the solution, ensuring package constraints are met.
         is_valid(): Returns the validity status of the solution.
         priority_score(): Calculates the priority score of the solution based on priority packages in ULDs.
         economy_score(): Calculates the economy score based on the delays of unallocated packages.
@@ -34,6 +65,7 @@ class SolutionValidator:
         self.solution_ulds = solution.ulds
         self.valid = False
         self.package_collection = None
+        self.violations = []
         self.verbose = verbose
 
     def log(self, message):
@@ -46,13 +78,25 @@ class SolutionValidator:
         if self.verbose:
             print(message)
 
-    def validate_uld(self, uld, packages):
+    def violation(self, message):
+        """
+        Records and logs a violated constraint.
+
+        Args:
+            message (str): Description of the violation.
+        """
+        self.violations.append(message)
+        self.log(message)
+
+    def validate_uld(self, uld, packages, report_all=False):
         """
         Validates a single ULD, ensuring all packages fit inside without overlap.
 
         Args:
             uld (ULD): The ULD object to validate.
             packages (list): A list of Package objects to validate within the ULD.
+            report_all (bool, optional): If True, records every violation instead of stopping at the first one.
+                Default is False.
 
         Returns:
             bool: True if the ULD is valid, False otherwise.
@@ -61,52 +105,60 @@ class SolutionValidator:
         package_cuboid_list = []
 
         for package in packages:
-            package_cuboid = Cuboid(package.corners[0], package.corners[7])
+            package_cuboid = Cuboid(package.reference_corner, package.far_corner)
             package_cuboid_list.append(package_cuboid)
 
+        valid = True
         for i in range(len(package_cuboid_list)):
             if not package_cuboid_list[i].fits_inside(uld_cuboid):
-                self.log(f"Package {i} does not fit inside ULD {uld_cuboid}")
-                self.log(package_cuboid_list[i])
-                return False
-
-            for j in range(i + 1, len(package_cuboid_list)):
-                if package_cuboid_list[i].intersects(package_cuboid_list[j]):
-                    self.log(f"Package {i} intersects with Package {j}")
-                    self.log(f"{package_cuboid_list[i]}\n{package_cuboid_list[j]}")
+                self.violation(f"Package {packages[i].package_id} does not fit inside ULD {uld.uld_id}")
+                valid = False
+                if not report_all:
                     return False
 
-        return True
+        for i, j in find_overlaps(package_cuboid_list, report_all=report_all):
+            self.violation(f"Package {packages[i].package_id} intersects with Package {packages[j].package_id} in ULD {uld.uld_id}")
+            valid = False
+
+        return valid
 
-    def validate(self):
+    @profiled("validator.validate")
+    def validate(self, report_all=False):
         """
         Validates all ULDs in the solution, ensuring package constraints are met.
         Also checks maximum weight constraints for each ULD.
 
+        Args:
+            report_all (bool, optional): If True, keeps validating after a violation so that `violations`
+                lists all of them. Default is False.
+
         Returns:
             None
         """
         package_collection = {uld_id: [] for uld_id in self.solution_ulds}
         self.package_collection = package_collection
+        self.violations = []
 
         for package_id, package in self.solution_packages.items():
             if package.loaded:
                 package_collection[package.loaded].append(package)
             if package.loaded is None and package.priority:
-                self.valid = False
-                self.log(f"Priority package {package_id} is not loaded")
-                return
+                self.violation(f"Priority package {package_id} is not loaded")
+                if not report_all:
+                    self.valid = False
+                    return
 
         for uld_id in package_collection:
             uld = self.solution_ulds[uld_id]
             self.log(f"Validating ULD {uld_id}")
-            validate_uld_bool = self.validate_uld(uld, package_collection[uld_id])
+            validate_uld_bool = self.validate_uld(uld, package_collection[uld_id], report_all=report_all)
             if not validate_uld_bool:
-                self.valid = False
                 self.log(f"ULD {uld_id} is invalid")
-                return
-
-            self.log(f"ULD {uld_id} is valid")
+                if not report_all:
+                    self.valid = False
+                    return
+            else:
+                self.log(f"ULD {uld_id} is valid")
 
         self.log("Checking Max Weight Constraints")
         for uld_id in package_collection:
@@ -114,12 +166,14 @@ class SolutionValidator:
             uld_max_weight = uld.capacity
             package_weight = sum([package.weight for package in package_collection[uld_id]])
             if package_weight > uld_max_weight:
-                self.valid = False
-                self.log(f"ULD {uld_id} exceeds max weight")
-                return
-
-        self.log("All Constraints Satisfied!!")
-        self.valid = True
+                self.violation(f"ULD {uld_id} exceeds max weight")
+                if not report_all:
+                    self.valid = False
+                    return
+
+        self.valid = not self.violations
+        if self.valid:
+            self.log("All Constraints Satisfied!!")
         return
 
     def is_valid(self):
@@ -184,3 +238,187 @@ class SolutionValidator:
         economy_score, priority_score = self.economy_score(), self.priority_score()
 
         return economy_score + priority_score
+
+
+class IncrementalValidator:
+    """
+    A validator that follows the placements as they are made, instead of walking the whole solution
+    afterwards. It subscribes to the ULDs of the solution and keeps, per ULD, the running weight and a
+    spatial index of the placed packages, so that `is_valid()` is O(1).
+
+    Attributes:
+        solution_ulds (dict): The ULDs of the solution, keyed by ID.
+        verbose (bool): Enables verbose logging if set to True.
+        placements (dict): Maps each placed package ID to its ULD ID, cuboid and weight.
+        cuboid_owners (dict): Maps the id() of each placed cuboid to its package ID.
+        uld_weights (dict): Running total weight of the packages in each ULD.
+        uld_indexes (dict): Spatial index of the packages in each ULD.
+        overlapping_pairs (set): Pairs of IDs of overlapping packages.
+        outside_packages (set): IDs of packages not fitting inside their ULD.
+        overweight_ulds (set): IDs of ULDs exceeding their weight capacity.
+        num_priority_packages (int): Number of priority packages in the solution.
+        loaded_priority_packages (set): IDs of the loaded priority packages.
+
+    Methods:
+        on_place(uld, package): Records the placement of a package in a ULD.
+        on_refresh(uld): Forgets the placements of a ULD that is being refreshed.
+        is_valid(): Returns the validity status of the solution.
+        violations(): Returns messages describing the violated constraints.
+    """
+
+    def __init__(self, solution, verbose=False):
+        """
+        Initializes the IncrementalValidator, records the placements already made in the solution
+        and subscribes to its ULDs.
+
+        Args:
+            solution (object): The solution object containing packages and ULDs.
+            verbose (bool, optional): Enables verbose logging if set to True. Default is False.
+        """
+        self.solution_ulds = solution.ulds
+        self.verbose = verbose
+        self.placements = {}
+        self.cuboid_owners = {}
+        self.uld_weights = {uld_id: 0 for uld_id in self.solution_ulds}
+        self.uld_indexes = {uld_id: self.new_index(uld) for uld_id, uld in self.solution_ulds.items()}
+        self.overlapping_pairs = set()
+        self.outside_packages = set()
+        self.overweight_ulds = set()
+        self.num_priority_packages = sum(1 for package in solution.packages.values() if package.priority)
+        self.loaded_priority_packages = set()
+
+        for uld in self.solution_ulds.values():
+            for package in uld.packages.values():
+                if package.loaded == uld.uld_id:
+                    self.on_place(uld, package)
+            uld.subscribe(self)
+
+    def log(self, message):
+        """
+        Logs a message if verbose is enabled.
+
+        Args:
+            message (str): The message to log.
+        """
+        if self.verbose:
+            print(message)
+
+    @staticmethod
+    def new_index(uld):
+        """
+        Creates an empty spatial index covering a ULD.
+
+        Args:
+            uld (ULD): The ULD.
+
+        Returns:
+            CuboidGrid: The empty index.
+        """
+        return CuboidGrid(Cuboid((0, 0, 0), (uld.length, uld.width, uld.height)))
+
+    def on_place(self, uld, package):
+        """
+        Records the placement of a package in a ULD, updating the weight, overlap and priority bookkeeping.
+
+        Args:
+            uld (ULD): The ULD the package was placed in.
+            package (Package): The placed package.
+        """
+        package_cuboid = Cuboid(package.reference_corner, package.far_corner)
+        previous = self.placements.get(package.package_id)
+        if previous is not None:
+            previous_uld_id, previous_cuboid, _ = previous
+            if previous_uld_id == uld.uld_id and (previous_cuboid.min_corner, previous_cuboid.max_corner) == (package_cuboid.min_corner, package_cuboid.max_corner):
+                return
+            self.remove_placement(package.package_id)
+
+        self.placements[package.package_id] = (uld.uld_id, package_cuboid, package.weight)
+        self.cuboid_owners[id(package_cuboid)] = package.package_id
+
+        uld_cuboid = Cuboid((0, 0, 0), (uld.length, uld.width, uld.height))
+        if not package_cuboid.fits_inside(uld_cuboid):
+            self.outside_packages.add(package.package_id)
+            self.log(f"Package {package.package_id} does not fit inside ULD {uld.uld_id}")
+
+        index = self.uld_indexes[uld.uld_id]
+        for other_cuboid in index.query(package_cuboid):
+            if package_cuboid.intersects(other_cuboid):
+                other_package_id = self.cuboid_owners[id(other_cuboid)]
+                self.overlapping_pairs.add(tuple(sorted((package.package_id, other_package_id))))
+                self.log(f"Package {package.package_id} intersects with Package {other_package_id} in ULD {uld.uld_id}")
+        index.insert(package_cuboid)
+
+        self.uld_weights[uld.uld_id] += package.weight
+        if self.uld_weights[uld.uld_id] > uld.capacity:
+            self.overweight_ulds.add(uld.uld_id)
+
+        if package.priority:
+            self.loaded_priority_packages.add(package.package_id)
+
+    def remove_placement(self, package_id):
+        """
+        Forgets the placement of a package, rebuilding the spatial index of its ULD.
+
+        Args:
+            package_id (str): The ID of the package.
+        """
+        uld_id, package_cuboid, weight = self.placements.pop(package_id)
+        del self.cuboid_owners[id(package_cuboid)]
+        uld = self.solution_ulds[uld_id]
+        self.outside_packages.discard(package_id)
+        self.overlapping_pairs = {pair for pair in self.overlapping_pairs if package_id not in pair}
+        self.uld_indexes[uld_id] = self.new_index(uld)
+        for other_uld_id, other_cuboid, _ in self.placements.values():
+            if other_uld_id == uld_id:
+                self.uld_indexes[uld_id].insert(other_cuboid)
+        self.uld_weights[uld_id] -= weight
+        if self.uld_weights[uld_id] <= uld.capacity:
+            self.overweight_ulds.discard(uld_id)
+        self.loaded_priority_packages.discard(package_id)
+
+    def on_refresh(self, uld):
+        """
+        Forgets all the placements of a ULD that is being refreshed.
+
+        Args:
+            uld (ULD): The refreshed ULD.
+        """
+        removed_ids = {package_id for package_id, (uld_id, _, _) in self.placements.items() if uld_id == uld.uld_id}
+        for package_id in removed_ids:
+            _, package_cuboid, _ = self.placements.pop(package_id)
+            del self.cuboid_owners[id(package_cuboid)]
+        self.outside_packages -= removed_ids
+        self.overlapping_pairs = {pair for pair in self.overlapping_pairs if not (set(pair) & removed_ids)}
+        self.loaded_priority_packages -= removed_ids
+        self.uld_indexes[uld.uld_id] = self.new_index(uld)
+        self.uld_weights[uld.uld_id] = 0
+        self.overweight_ulds.discard(uld.uld_id)
+
+    def is_valid(self):
+        """
+        Returns the validity status of the solution, in O(1).
+
+        Returns:
+            bool: True if the solution is valid, False otherwise.
+        """
+        return (not self.overlapping_pairs and not self.outside_packages and not self.overweight_ulds and
+                len(self.loaded_priority_packages) == self.num_priority_packages)
+
+    def violations(self):
+        """
+        Returns messages describing the violated constraints.
+
+        Returns:
+            list: The violations, in the format of SolutionValidator.violations.
+        """
+        violations = []
+        num_unloaded_priority = self.num_priority_packages - len(self.loaded_priority_packages)
+        if num_unloaded_priority:
+            violations.append(f"{num_unloaded_priority} priority packages are not loaded")
+        for package_id in sorted(self.outside_packages):
+            violations.append(f"Package {package_id} does not fit inside ULD {self.placements[package_id][0]}")
+        for package_id1, package_id2 in sorted(self.overlapping_pairs):
+            violations.append(f"Package {package_id1} intersects with Package {package_id2} in ULD {self.placements[package_id1][0]}")
+        for uld_id in sorted(self.overweight_ulds):
+            violations.append(f"ULD {uld_id} exceeds max weight")
+        return violations